@@ -8,10 +8,17 @@ ALREADY_ON_THE_SHOPPING_LIST = 'Рецепт уже в списке покупо
 # backend/api/serializers.py
 ONE_OR_MORE_INGREDIENTS = 'Введите 1 или более ингридиетов.'
 COOKING_TIME = 'Время приготовления не может быть меньше одной минуты.'
+INGREDIENTS_DO_NOT_EXIST = 'Ингредиенты не найдены: {}.'
+INVALID_INGREDIENTS_JSON = 'Ингредиенты нужно передать JSON-списком.'
+IMAGE_TOO_LARGE = 'Размер картинки не должен превышать {} МБ.'
+IMAGE_DIMENSIONS_TOO_LARGE = (
+    'Ширина и высота картинки не должны превышать {} пикселей.'
+)
 
 
 # backend/api/mixins.py
 COMPLETED_EARLIER = 'Действие выполнено ранее.'
+UNKNOWN_FIELDS = 'Неизвестные поля: {}.'
 
 
 # backend/api/mixins.py
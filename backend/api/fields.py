@@ -0,0 +1,41 @@
+import io
+
+from drf_extra_fields.fields import Base64FieldMixin, HybridImageField
+from rest_framework import serializers
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+
+from api.config.config import IMAGE_TOO_LARGE
+from api.utils.uploads import get_image_max_size_mb, validate_image_dimensions
+
+
+class RecipeImageField(HybridImageField):
+    """
+    Картинка рецепта: строка base64 в JSON или файл
+    в multipart/form-data.
+
+    Размер проверяется до декодирования base64, ширина и высота —
+    по заголовку картинки, до распаковки пикселей.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            payload = data.rpartition(';base64,')[2]
+            if len(payload) * 3 // 4 > settings.RECIPE_IMAGE_MAX_SIZE:
+                self.fail_too_large()
+            return Base64FieldMixin.to_internal_value(self, data)
+        if isinstance(data, UploadedFile):
+            if data.size > settings.RECIPE_IMAGE_MAX_SIZE:
+                self.fail_too_large()
+            validate_image_dimensions(data)
+        return serializers.ImageField.to_internal_value(self, data)
+
+    def get_file_extension(self, filename, decoded_file):
+        validate_image_dimensions(io.BytesIO(decoded_file))
+        return super().get_file_extension(filename, decoded_file)
+
+    def fail_too_large(self):
+        raise serializers.ValidationError(
+            IMAGE_TOO_LARGE.format(get_image_max_size_mb())
+        )
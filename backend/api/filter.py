@@ -4,8 +4,16 @@ from typing import Any
 from django_filters import rest_framework as filters
 
 from django.db import models
+from django.db.models import Case, F, IntegerField, Value, When
 
-from baseapp.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from api.utils.membership import get_recipe_membership
+from api.utils.recipe_ingredient_index import recipe_ingredient_index
+from api.utils.search import search_recipes
+from baseapp.models import Ingredient, Recipe, Tag
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
 
 
 class RecipeFilter(filters.FilterSet):
@@ -35,15 +43,71 @@ class RecipeFilter(filters.FilterSet):
     tags = filters.ModelMultipleChoiceFilter(
         field_name='tags__slug',
         to_field_name='slug',
-        queryset=Tag.objects.all()
+        queryset=Tag.objects.all(),
+        method='tags_method'
     )
 
+    search = filters.CharFilter(method='search_method')
+
+    have = NumberInFilter(method='have_method')
+    exclude_ingredients = NumberInFilter(method='exclude_ingredients_method')
+
+    def have_method(self, queryset: Any, name: str, value: list) -> Any:
+        # Кандидаты и их порядок берутся из индекса ингредиентов,
+        # база только отсекает удаленные рецепты и остальные фильтры.
+        exclude = self.form.cleaned_data.get('exclude_ingredients') or ()
+        recipe_ids = recipe_ingredient_index.search(
+            map(int, value), map(int, exclude)
+        )
+        if not recipe_ids:
+            return queryset.none()
+
+        return queryset.filter(id__in=recipe_ids).alias(
+            coverage_rank=Case(
+                *(
+                    When(id=recipe_id, then=Value(position))
+                    for position, recipe_id in enumerate(recipe_ids)
+                ),
+                output_field=IntegerField(),
+            )
+        ).order_by('coverage_rank')
+
+    def exclude_ingredients_method(
+        self,
+        queryset: Any,
+        name: str,
+        value: list
+    ) -> Any:
+        return queryset.exclude(
+            recipeingredients__ingredient_id__in=value
+        )
+
+    def search_method(self, queryset: Any, name: str, value: str) -> Any:
+        return search_recipes(queryset, value)
+
+    def tags_method(self, queryset: Any, name: str, value: list) -> Any:
+        # Рецепт подходит, если в его маске есть хотя бы один из битов
+        # выбранных тэгов: без JOIN на таблицу связей и без DISTINCT.
+        # Индекс по маске такое условие не использует, маска проверяется
+        # у строк, уже отобранных остальными фильтрами.
+        if not value:
+            return queryset
+        if any(tag.bit is None for tag in value):
+            return queryset.filter(tags__in=value).distinct()
+
+        mask = 0
+        for tag in value:
+            mask |= tag.mask
+
+        return queryset.alias(
+            matched_tags=F('tags_mask').bitand(mask)
+        ).exclude(matched_tags=0)
+
     def is_favorited_method(self, queryset: Any, name: str, value: str) -> Any:
         if self.request.user.is_anonymous:
             return Recipe.objects.none()
 
-        favorites = Favorite.objects.filter(user=self.request.user)
-        recipe_ids = favorites.values_list('recipe__id', flat=True)
+        recipe_ids = get_recipe_membership(self.request, 'favorite')
 
         if not strtobool(value):
             return queryset.exclude(id__in=recipe_ids)
@@ -59,8 +123,7 @@ class RecipeFilter(filters.FilterSet):
         if self.request.user.is_anonymous:
             return Recipe.objects.none()
 
-        shopping_cart = ShoppingCart.objects.filter(user=self.request.user)
-        recipe_ids = shopping_cart.values_list('recipe__id', flat=True)
+        recipe_ids = get_recipe_membership(self.request, 'shoppingcart')
 
         if not strtobool(value):
             return queryset.exclude(id__in=recipe_ids)
@@ -0,0 +1,76 @@
+import time
+
+from rest_framework.test import APIClient
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from baseapp.models import Recipe
+from users.models import User
+
+
+class Rollback(Exception):
+    """Откатывает изменения после замера."""
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает добавление рецептов в корзину по одному и одним '
+        'запросом к /api/recipes/shopping_cart/. Все изменения '
+        'откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Имя пользователя.')
+        parser.add_argument('--recipes', type=int, default=50)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'Нет пользователя {options["user"]}')
+        recipe_ids = list(
+            Recipe.objects.exclude(
+                in_shopping_list__user=user
+            ).values_list('pk', flat=True)[:options['recipes']]
+        )
+        if not recipe_ids:
+            raise CommandError('Нет рецептов, которых нет в корзине.')
+
+        client = APIClient(SERVER_NAME='testserver')
+        client.force_authenticate(user)
+
+        def single():
+            for pk in recipe_ids:
+                client.post(f'/api/recipes/{pk}/shopping_cart/')
+            for pk in recipe_ids:
+                client.delete(f'/api/recipes/{pk}/shopping_cart/')
+
+        def bulk():
+            for method in (client.post, client.delete):
+                method(
+                    '/api/recipes/shopping_cart/',
+                    {'recipes': recipe_ids},
+                    format='json',
+                )
+
+        self.stdout.write(f'Рецептов: {len(recipe_ids)}')
+        for title, run in (('По одному', single), ('Одним запросом', bulk)):
+            queries, elapsed = self.measure(run)
+            self.stdout.write(
+                f'{title}: {elapsed * 1000:.0f} мс, '
+                f'SQL-запросов: {queries}'
+            )
+
+    def measure(self, run):
+        try:
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as context:
+                    started = time.perf_counter()
+                    run()
+                    elapsed = time.perf_counter() - started
+                raise Rollback
+        except Rollback:
+            pass
+        return len(context), elapsed
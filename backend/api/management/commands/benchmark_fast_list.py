@@ -0,0 +1,62 @@
+import statistics
+import time
+
+from rest_framework.test import APIClient
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время ответа списков рецептов, тегов и ингредиентов '
+        'с выключенным и включенным FAST_LIST_SERIALIZATION. '
+        'Только читает данные.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Имя пользователя.')
+        parser.add_argument('--limit', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=50)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'Нет пользователя {options["user"]}')
+
+        # Ответы авторизованному пользователю не кэшируются целиком,
+        # поэтому каждый запрос сериализует список заново.
+        client = APIClient(SERVER_NAME='testserver')
+        client.force_authenticate(user)
+        urls = (
+            f'/api/recipes/?limit={options["limit"]}',
+            '/api/tags/',
+            '/api/ingredients/',
+        )
+
+        self.stdout.write(f'Запросов на каждый адрес: {options["requests"]}')
+        for url in urls:
+            results = []
+            for fast in (False, True):
+                with override_settings(FAST_LIST_SERIALIZATION=fast):
+                    timings = self.measure(client, url, options['requests'])
+                results.append(
+                    f'{statistics.mean(timings) * 1000:.1f} мс'
+                )
+            self.stdout.write(
+                f'{url}: обычный путь {results[0]}, быстрый {results[1]}'
+            )
+
+    @staticmethod
+    def measure(client, url, requests) -> list:
+        timings = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise CommandError(f'{url}: ответ {response.status_code}')
+        return timings
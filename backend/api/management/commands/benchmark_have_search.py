@@ -0,0 +1,80 @@
+import itertools
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.utils.recipe_ingredient_index import RecipeIngredientIndex
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет поиск рецептов по имеющимся ингредиентам на '
+        'синтетическом каталоге, не обращаясь к базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100_000)
+        parser.add_argument('--ingredients', type=int, default=2200)
+        parser.add_argument('--per-recipe', type=int, default=8)
+        parser.add_argument('--have', type=int, default=12)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--min-coverage', type=float, default=0.5)
+        parser.add_argument('--limit', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        ingredients = range(1, options['ingredients'] + 1)
+        # Популярность ингредиентов неравномерна: соль и лук встречаются
+        # почти везде, большинство остальных — редко.
+        weights = list(
+            itertools.accumulate(1 / rank for rank in ingredients)
+        )
+
+        rows = []
+        for recipe_id in range(1, options['recipes'] + 1):
+            count = rng.randint(
+                max(1, options['per_recipe'] - 3), options['per_recipe'] + 3
+            )
+            chosen = set(
+                rng.choices(ingredients, cum_weights=weights, k=count)
+            )
+            rows.extend((recipe_id, ingredient) for ingredient in chosen)
+
+        index = RecipeIngredientIndex()
+        started = time.perf_counter()
+        index.build(rows)
+        build_time = time.perf_counter() - started
+
+        timings = []
+        found = []
+        for _ in range(options['queries']):
+            have = set(
+                rng.choices(
+                    ingredients, cum_weights=weights, k=options['have']
+                )
+            )
+            exclude = rng.sample(ingredients, 2)
+            started = time.perf_counter()
+            result = index.rank(
+                have,
+                exclude,
+                min_coverage=options['min_coverage'],
+                limit=options['limit'],
+            )
+            timings.append(time.perf_counter() - started)
+            found.append(len(result))
+
+        timings.sort()
+        self.stdout.write(
+            f'Рецептов: {options["recipes"]}, связей: {len(rows)}\n'
+            f'Построение индекса: {build_time:.2f} с\n'
+            f'Среднее время запроса: '
+            f'{statistics.mean(timings) * 1000:.2f} мс\n'
+            f'95-й перцентиль: '
+            f'{timings[int(len(timings) * 0.95)] * 1000:.2f} мс\n'
+            f'Среднее число найденных рецептов: '
+            f'{statistics.mean(found):.0f}'
+        )
@@ -0,0 +1,118 @@
+import base64
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from io import BytesIO
+
+from PIL import Image
+from rest_framework.test import APIClient
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    override_settings,
+    setup_databases,
+    teardown_databases,
+)
+
+from api.utils.images import wait_for_image_jobs
+from baseapp.models import Ingredient, Tag
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время ответа на создание рецепта с картинкой без '
+        'построения вариантов, с фоновым и с синхронным построением. '
+        'Замер идет в отдельной тестовой базе, картинки пишутся '
+        'во временный каталог; после замера все удаляется.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=10)
+        parser.add_argument('--width', type=int, default=2400)
+        parser.add_argument('--height', type=int, default=1600)
+
+    def handle(self, *args, **options):
+        media_root = tempfile.mkdtemp()
+        # Фоновые задачи читают рецепт из своих соединений, поэтому
+        # откатываемая транзакция не подходит: нужна отдельная база.
+        old_config = setup_databases(
+            verbosity=0, interactive=False, aliases={'default'}
+        )
+        try:
+            with override_settings(
+                MEDIA_ROOT=media_root,
+                CACHES={
+                    alias: {
+                        'BACKEND': (
+                            'django.core.cache.backends.locmem.LocMemCache'
+                        ),
+                        'LOCATION': alias,
+                    }
+                    for alias in ('default', 'versions')
+                },
+            ):
+                self.run_benchmark(options)
+        finally:
+            wait_for_image_jobs()
+            teardown_databases(old_config, verbosity=0)
+            shutil.rmtree(media_root, ignore_errors=True)
+
+    def run_benchmark(self, options):
+        user = User.objects.create_user(
+            email='benchmark@example.org', username='benchmark',
+            first_name='Замер', last_name='Картинок',
+        )
+        tag = Tag.objects.create(
+            name='Замер', color='#000000', slug='benchmark'
+        )
+        ingredient = Ingredient.objects.create(
+            name='вода', measurement_unit='мл'
+        )
+
+        client = APIClient(SERVER_NAME='testserver')
+        client.force_authenticate(user)
+        payload = {
+            'name': 'Замер картинок',
+            'text': 'Рецепт для замера.',
+            'cooking_time': 1,
+            'tags': [tag.pk],
+            'ingredients': [{'id': ingredient.pk, 'amount': 1}],
+            'image': self.make_image(options['width'], options['height']),
+        }
+
+        self.stdout.write(
+            f'Картинка {options["width"]}x{options["height"]}, '
+            f'запросов: {options["requests"]}'
+        )
+        for mode in ('off', 'thread', 'sync'):
+            with override_settings(IMAGE_PIPELINE=mode):
+                timings = []
+                started = time.perf_counter()
+                for _ in range(options['requests']):
+                    request_started = time.perf_counter()
+                    response = client.post(
+                        '/api/recipes/', payload, format='json'
+                    )
+                    timings.append(time.perf_counter() - request_started)
+                    if response.status_code != 201:
+                        raise CommandError(response.content.decode())
+                wait_for_image_jobs()
+                total = time.perf_counter() - started
+            self.stdout.write(
+                f'{mode}: ответ {statistics.mean(timings) * 1000:.0f} мс '
+                f'в среднем, всё вместе с вариантами {total:.2f} с'
+            )
+
+    @staticmethod
+    def make_image(width: int, height: int) -> str:
+        """Шумная JPEG-картинка: такие хуже всего сжимаются."""
+        image = Image.frombytes(
+            'RGB', (width, height), random.randbytes(width * height * 3)
+        )
+        buffer = BytesIO()
+        image.save(buffer, 'JPEG', quality=90)
+        encoded = base64.b64encode(buffer.getvalue()).decode()
+        return f'data:image/jpeg;base64,{encoded}'
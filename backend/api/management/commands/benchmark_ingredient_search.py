@@ -0,0 +1,70 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.utils.ingredient_index import ingredient_index
+from baseapp.models import Ingredient
+
+
+def make_typo(name: str, rng: random.Random) -> str:
+    """Заменить, удалить или переставить одну букву в названии."""
+    if len(name) < 4:
+        return name
+    position = rng.randrange(1, len(name) - 1)
+    kind = rng.choice(('replace', 'delete', 'swap'))
+    if kind == 'replace':
+        return name[:position] + 'о' + name[position + 1:]
+    if kind == 'delete':
+        return name[:position] + name[position + 1:]
+    return (
+        name[:position - 1] + name[position] + name[position - 1]
+        + name[position + 1:]
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет нечеткий поиск ингредиентов по всему справочнику: '
+        'для каждого названия ищет его вариант с опечаткой.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--threshold', type=float, default=0.3)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        ingredients = list(Ingredient.objects.values_list('id', 'name'))
+
+        started = time.perf_counter()
+        ingredient_index.search_similar('', 1, 1)
+        build_time = time.perf_counter() - started
+
+        timings = []
+        found = 0
+        for ingredient_id, name in ingredients:
+            query = make_typo(name, rng)
+            started = time.perf_counter()
+            result = ingredient_index.search_similar(
+                query, options['limit'], options['threshold']
+            )
+            timings.append(time.perf_counter() - started)
+            found += any(row['id'] == ingredient_id for row in result)
+
+        if not timings:
+            self.stdout.write('Справочник ингредиентов пуст.')
+            return
+        timings.sort()
+        self.stdout.write(
+            f'Ингредиентов: {len(ingredients)}\n'
+            f'Построение индекса: {build_time * 1000:.1f} мс\n'
+            f'Среднее время запроса: '
+            f'{statistics.mean(timings) * 1000:.3f} мс\n'
+            f'95-й перцентиль: '
+            f'{timings[int(len(timings) * 0.95)] * 1000:.3f} мс\n'
+            f'Найдено исходное название в top-{options["limit"]}: '
+            f'{found / len(ingredients):.1%}'
+        )
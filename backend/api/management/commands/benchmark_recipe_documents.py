@@ -0,0 +1,89 @@
+import statistics
+import time
+
+from rest_framework.test import APIClient
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from baseapp.models import Recipe
+from users.models import User
+
+
+class Rollback(Exception):
+    """Откатывает изменения после замера."""
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время ответа списка рецептов, собранного из '
+        'сохраненных документов и сериализатором без них. Документы '
+        'стираются внутри транзакции, которая откатывается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Имя пользователя.')
+        parser.add_argument('--limit', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=50)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'Нет пользователя {options["user"]}')
+        if not Recipe.objects.exclude(document='').exists():
+            raise CommandError(
+                'Нет документов, выполните rebuild_recipe_documents.'
+            )
+
+        # Ответы авторизованному пользователю не кэшируются целиком,
+        # поэтому каждый запрос собирает список заново.
+        client = APIClient(SERVER_NAME='testserver')
+        client.force_authenticate(user)
+        url = f'/api/recipes/?limit={options["limit"]}'
+
+        def run():
+            timings = []
+            for _ in range(options['requests']):
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    raise CommandError(
+                        f'{url}: ответ {response.status_code}'
+                    )
+            return timings
+
+        self.stdout.write(
+            f'Рецептов на странице: {options["limit"]}, '
+            f'запросов: {options["requests"]}'
+        )
+        for title, drop_documents in (
+            ('Без документов', True),
+            ('Из документов', False),
+        ):
+            queries, timings = self.measure(run, drop_documents)
+            timings.sort()
+            self.stdout.write(
+                f'{title}: среднее '
+                f'{statistics.mean(timings) * 1000:.1f} мс, '
+                f'95-й перцентиль '
+                f'{timings[int(len(timings) * 0.95)] * 1000:.1f} мс, '
+                f'SQL-запросов на ответ: '
+                f'{queries / options["requests"]:.0f}'
+            )
+
+    def measure(self, run, drop_documents):
+        try:
+            with transaction.atomic(), override_settings(
+                FAST_LIST_SERIALIZATION=False
+            ):
+                if drop_documents:
+                    Recipe.objects.update(document='')
+                with CaptureQueriesContext(connection) as context:
+                    timings = run()
+                raise Rollback
+        except Rollback:
+            pass
+        return len(context), timings
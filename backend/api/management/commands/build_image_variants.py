@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from api.utils.images import build_image_variants, needs_image_variants
+from baseapp.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит варианты картинок рецептов, у которых они не построены '
+        'или построены для старой картинки.'
+    )
+
+    def handle(self, *args, **options):
+        built = 0
+        for recipe in Recipe.objects.only(
+            'image', 'image_variants'
+        ).iterator(chunk_size=500):
+            if needs_image_variants(recipe):
+                built += build_image_variants(recipe.pk)
+        self.stdout.write(
+            self.style.SUCCESS(f'Обработано картинок: {built}')
+        )
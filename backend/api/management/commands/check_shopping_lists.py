@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+
+from baseapp.models import RecipeIngredients, ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает списки покупок из корзин с нуля и сравнивает '
+        'с сохраненными суммами ShoppingListItem.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Перезаписать списки пользователей с расхождениями.'
+        )
+
+    def handle(self, *args, **options):
+        expected = {
+            (row['recipe__in_shopping_list__user'], row['ingredient_id']):
+                row['total']
+            for row in RecipeIngredients.objects.filter(
+                recipe__in_shopping_list__isnull=False
+            ).values(
+                'recipe__in_shopping_list__user', 'ingredient_id'
+            ).annotate(total=Sum('amount')).iterator()
+        }
+        actual = dict(
+            ((user_id, ingredient_id), amount)
+            for user_id, ingredient_id, amount
+            in ShoppingListItem.objects.values_list(
+                'user_id', 'ingredient_id', 'amount'
+            ).iterator()
+        )
+
+        mismatches = sorted(
+            key for key in expected.keys() | actual.keys()
+            if expected.get(key) != actual.get(key)
+        )
+        for user_id, ingredient_id in mismatches:
+            self.stdout.write(
+                f'Пользователь {user_id}, ингредиент {ingredient_id}: '
+                f'ожидается {expected.get((user_id, ingredient_id))}, '
+                f'сохранено {actual.get((user_id, ingredient_id))}'
+            )
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
+            return
+
+        if not options['fix']:
+            raise CommandError(f'Расхождений: {len(mismatches)}')
+
+        user_ids = {user_id for user_id, _ in mismatches}
+        with transaction.atomic():
+            ShoppingListItem.objects.filter(user_id__in=user_ids).delete()
+            ShoppingListItem.objects.bulk_create(
+                [
+                    ShoppingListItem(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        amount=amount,
+                    )
+                    for (user_id, ingredient_id), amount in expected.items()
+                    if user_id in user_ids
+                ],
+                batch_size=1000,
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f'Исправлено пользователей: {len(user_ids)}')
+        )
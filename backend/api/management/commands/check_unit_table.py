@@ -0,0 +1,72 @@
+import csv
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.utils.units import (
+    DISPLAY_UNITS,
+    HOUSEHOLD_UNITS,
+    UNCONVERTED_UNITS,
+    UNIT_ALIASES,
+    UNIT_CONVERSIONS,
+    get_unit_table,
+    normalize_unit,
+)
+
+
+def simplify(unit: str) -> str:
+    """Написание единицы без регистра, точек и пробелов."""
+    return unit.lower().replace('.', '').replace(' ', '')
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверяет таблицу пересчета единиц на словаре единиц '
+        'из CSV-файла ингредиентов (название, единица).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к ingredients.csv')
+
+    def handle(self, *args, **options):
+        with open(options['path'], encoding='utf-8') as file:
+            units = Counter(row[1] for row in csv.reader(file) if row)
+
+        errors = []
+        for alias, unit in UNIT_ALIASES.items():
+            if alias in UNIT_CONVERSIONS:
+                errors.append(f'«{alias}» одновременно единица и синоним')
+            if (
+                unit not in UNIT_CONVERSIONS
+                and unit not in UNCONVERTED_UNITS
+            ):
+                errors.append(
+                    f'Синоним «{alias}» ведет к неизвестной «{unit}»'
+                )
+        for unit in units:
+            if unit not in get_unit_table() and unit not in UNCONVERTED_UNITS:
+                errors.append(
+                    f'«{unit}» нет ни в таблице, ни в UNCONVERTED_UNITS'
+                )
+        for unit in HOUSEHOLD_UNITS:
+            if normalize_unit(unit)[0] not in DISPLAY_UNITS:
+                errors.append(f'Для «{unit}» нет единиц показа')
+
+        # Разные написания одной единицы в справочнике должны быть
+        # в таблице, иначе они попадут в список покупок отдельно.
+        spellings = {}
+        for unit in units:
+            spellings.setdefault(simplify(unit), []).append(unit)
+        for variants in spellings.values():
+            if len({normalize_unit(unit)[0] for unit in variants}) > 1:
+                errors.append(
+                    f'Написания {", ".join(variants)} не сведены '
+                    f'к одной единице'
+                )
+
+        for unit, count in units.most_common():
+            base, factor = normalize_unit(unit)
+            self.stdout.write(f'{unit:>12} ({count:>4}) → {factor} {base}')
+        if errors:
+            raise CommandError('\n'.join(errors))
+        self.stdout.write(self.style.SUCCESS('Таблица единиц согласована.'))
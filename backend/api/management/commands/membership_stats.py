@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.utils.membership import get_membership_stats, reset_membership_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Выводит попадания и промахи кэша избранного и списка покупок. '
+        'Счетчики ведутся при MEMBERSHIP_CACHE_STATS=True.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Обнулить счетчики после вывода.'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.MEMBERSHIP_CACHE_STATS:
+            self.stdout.write(self.style.WARNING(
+                'MEMBERSHIP_CACHE_STATS выключен, счетчики не обновляются.'
+            ))
+        stats = get_membership_stats()
+        total = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / total * 100 if total else 0
+        self.stdout.write(
+            f'Попаданий: {stats["hits"]}\n'
+            f'Промахов: {stats["misses"]}\n'
+            f'Доля попаданий: {ratio:.1f}%'
+        )
+        if options['reset']:
+            reset_membership_stats()
+            self.stdout.write('Счетчики обнулены.')
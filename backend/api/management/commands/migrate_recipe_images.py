@@ -0,0 +1,50 @@
+import posixpath
+
+from django.core.management.base import BaseCommand
+
+from api.utils.cache_utils import bump_versions
+from baseapp.documents import rebuild_recipe_documents
+from baseapp.models import Recipe
+from baseapp.signals import delete_unused_image
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки рецептов, сохраненные под исходными именами, '
+        'в хранилище с именами по содержимому. Одинаковые файлы '
+        'сливаются в один.'
+    )
+
+    def handle(self, *args, **options):
+        field = Recipe._meta.get_field('image')
+        moved = []
+        for recipe in Recipe.objects.exclude(image='').only(
+            'image', 'image_variants'
+        ).iterator(chunk_size=500):
+            old = recipe.image.name
+            if not field.storage.exists(old):
+                self.stderr.write(f'Рецепт {recipe.pk}: нет файла {old}')
+                continue
+            with field.storage.open(old, 'rb') as image:
+                new = field.storage.save(
+                    field.generate_filename(recipe, posixpath.basename(old)),
+                    image,
+                )
+            if new == old:
+                continue
+            variants = recipe.image_variants
+            if variants.get('source') == old:
+                # Варианты построены по тому же содержимому.
+                variants = {**variants, 'source': new}
+            if Recipe.objects.filter(pk=recipe.pk, image=old).update(
+                image=new, image_variants=variants
+            ):
+                moved.append(recipe.pk)
+            delete_unused_image(old)
+
+        # update() не вызывает сигналы: адрес картинки есть в документе.
+        rebuild_recipe_documents(Recipe.objects.filter(pk__in=moved))
+        bump_versions('recipe')
+        self.stdout.write(
+            self.style.SUCCESS(f'Перенесено картинок: {len(moved)}')
+        )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from baseapp.documents import rebuild_recipe_documents
+from baseapp.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает готовые документы всех рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--missing',
+            action='store_true',
+            help='Только рецепты, у которых еще нет документа.'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.all()
+        if options['missing']:
+            recipes = recipes.filter(document='')
+        updated = rebuild_recipe_documents(recipes)
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересобрано документов: {updated}')
+        )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from api.utils.search import (
+    is_full_text_search_supported,
+    update_recipe_search_vectors,
+)
+from baseapp.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает поисковые векторы всех рецептов.'
+
+    def handle(self, *args, **options):
+        if not is_full_text_search_supported():
+            self.stdout.write(
+                'Полнотекстовый поиск доступен только на PostgreSQL, '
+                'пересчитывать нечего.'
+            )
+            return
+        updated = update_recipe_search_vectors(Recipe.objects.all())
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитано рецептов: {updated}')
+        )
@@ -1,17 +1,33 @@
 from rest_framework.response import Response
-from rest_framework.serializers import ModelSerializer
+from rest_framework.serializers import (
+    ListSerializer,
+    ModelSerializer,
+    ValidationError,
+)
 from rest_framework.status import (
     HTTP_201_CREATED,
     HTTP_204_NO_CONTENT,
     HTTP_400_BAD_REQUEST,
 )
 
+from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Model, Q
 from django.db.utils import IntegrityError
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 
-from api.config.config import COMPLETED_EARLIER
+from api.config.config import COMPLETED_EARLIER, UNKNOWN_FIELDS
 from api.permissions import IsAdminOrReadOnly
+from api.utils.cache_utils import (
+    get_versions,
+    get_view_versions,
+    make_cache_key,
+    make_digest,
+    normalize_query_params,
+)
+from api.utils.serializers_utils import get_sparse_fieldset, is_field_requested
 
 
 class ViewMixin:
@@ -67,3 +83,178 @@ class MultiSerializerViewSetMixin:
             return self.serializer_classes[self.action]
         except KeyError:
             return super().get_serializer_class()
+
+
+class SparseFieldsetMixin:
+    """
+    Миксина сериализатора, оставляющая в ответе только поля,
+    запрошенные параметрами ?fields= и ?omit=.
+
+    Действует только на корневой сериализатор запроса,
+    вложенные сериализаторы выводятся целиком. Имена, которых нет
+    среди полей сериализатора, дают ответ 400 с их списком.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        parent = self.parent
+        if isinstance(parent, ListSerializer):
+            parent = parent.parent
+        if parent is not None:
+            return fields
+
+        request = self.context.get('request')
+        requested, omit = get_sparse_fieldset(request)
+        errors = {
+            param: [UNKNOWN_FIELDS.format(', '.join(sorted(unknown)))]
+            for param, unknown in (
+                ('fields', (requested or set()) - fields.keys()),
+                ('omit', omit - fields.keys()),
+            )
+            if unknown
+        }
+        if errors:
+            raise ValidationError(errors)
+
+        return {
+            name: field for name, field in fields.items()
+            if is_field_requested(request, name)
+        }
+
+
+class AnonymousResponseCacheMixin:
+    """
+    Кэширует ответы list и retrieve для анонимных пользователей.
+
+    Для анонимного пользователя ответ зависит только от адреса
+    и параметров запроса, поэтому ключ строится из них и версий таблиц
+    из cache_versions представления. Версии хранятся в общем кэше
+    Django, так что все воркеры видят инвалидацию одновременно.
+    """
+
+    cache_versions: tuple = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        if not request.user.is_anonymous:
+            return handler(request, *args, **kwargs)
+
+        key = make_cache_key(
+            'response',
+            request.build_absolute_uri(request.path),
+            normalize_query_params(request, exclude=()),
+            get_versions(*self.cache_versions),
+        )
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    Поддержка условных GET-запросов (ETag и Last-Modified) для list
+    и retrieve.
+
+    Валидаторы вычисляются без сериализации: из адреса, параметров,
+    пользователя, версий таблиц представления (cache_versions
+    и user_cache_versions) и, для retrieve, поля last_modified_field
+    объекта. Если клиент прислал совпадающие If-None-Match
+    или If-Modified-Since, сразу возвращается 304.
+    """
+
+    cache_versions: tuple = ()
+    user_cache_versions: tuple = ()
+    last_modified_field: str = None
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_conditional_response(self, handler, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request, **kwargs)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is not None:
+            return response
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def get_validators(self, request, **kwargs) -> tuple:
+        """
+        Вычисляет ETag и время последнего изменения ответа.
+
+        Returns:
+            tuple: Строгий ETag и время изменения (Unix timestamp).
+        """
+        versions = get_view_versions(request, self)
+        timestamps = [version / 1e9 for version in versions]
+
+        object_modified = None
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if self.last_modified_field and lookup_url_kwarg in kwargs:
+            object_modified = self.get_queryset().model.objects.filter(
+                **{self.lookup_field: kwargs[lookup_url_kwarg]}
+            ).values_list(self.last_modified_field, flat=True).first()
+            if object_modified is not None:
+                timestamps.append(object_modified.timestamp())
+
+        etag = make_digest(
+            request.build_absolute_uri(request.path),
+            normalize_query_params(request, exclude=()),
+            request.accepted_media_type,
+            request.user.pk,
+            versions,
+            object_modified,
+        )
+        return f'"{etag}"', int(max(timestamps, default=0))
+
+
+class FastListMixin:
+    """
+    Быстрый путь для list в обход полей DRF.
+
+    Если включена настройка FAST_LIST_SERIALIZATION и у сериализатора
+    есть метод fast_list_representation, ответ строится им из строк
+    queryset или страницы. JSON совпадает с обычным путем.
+    """
+
+    def list(self, request, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        if not (
+            settings.FAST_LIST_SERIALIZATION
+            and hasattr(serializer_class, 'fast_list_representation')
+        ):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        data = serializer_class.fast_list_representation(
+            queryset if page is None else page,
+            self.get_serializer_context(),
+        )
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
@@ -1,9 +1,192 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
 
 from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from api.utils.cache_utils import (
+    PAGINATION_PARAMS,
+    get_view_versions,
+    make_cache_key,
+    normalize_query_params,
+)
+
+
+class CustomCursorPagination(CursorPagination):
+    """
+    Пагинация по курсору (keyset): без COUNT(*) и OFFSET,
+    стоимость страницы не зависит от глубины прокрутки.
+    """
+
+    page_size = settings.PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = settings.MAX_PAGE_SIZE
+    ordering = ('-pub_date', '-id')
 
 
 class CustomPagination(PageNumberPagination):
+    """
+    Постраничная пагинация ?page=&limit=.
+
+    Если в запросе передан параметр ?cursor= (в том числе пустой
+    для первой страницы), используется пагинация по курсору.
+    Порядок для курсора берется из атрибута cursor_ordering
+    представления.
+
+    Курсор работает только при фиксированном порядке. Если в запросе
+    есть параметр из ranked_query_params представления (поиск,
+    подбор по ингредиентам), результаты упорядочены по релевантности,
+    и используется постраничная пагинация.
+    """
+
     page_size = settings.PAGE_SIZE
     page_size_query_param = 'limit'
     max_page_size = settings.MAX_PAGE_SIZE
+    cursor_pagination_class = CustomCursorPagination
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        cursor_query_param = self.cursor_pagination_class.cursor_query_param
+        if (
+            cursor_query_param not in request.query_params
+            or self.is_ranked(request, view)
+        ):
+            return super().paginate_queryset(queryset, request, view)
+
+        self.cursor_paginator = self.cursor_pagination_class()
+        self.cursor_paginator.ordering = getattr(
+            view, 'cursor_ordering', self.cursor_paginator.ordering
+        )
+        return self.cursor_paginator.paginate_queryset(
+            queryset, request, view
+        )
+
+    @staticmethod
+    def is_ranked(request, view) -> bool:
+        """Порядок результатов задает параметр релевантности."""
+        return any(
+            request.query_params.get(param)
+            for param in getattr(view, 'ranked_query_params', ())
+        )
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator, который не считает COUNT(*) на каждый запрос.
+
+    Количество объектов берется из кэша по ключу count_key.
+    Для запросов без фильтров на PostgreSQL используется оценка
+    планировщика из pg_class, если таблица достаточно большая.
+    """
+
+    def __init__(self, object_list, per_page, count_key, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_key = count_key
+        self.count_is_estimated = False
+
+    @cached_property
+    def count(self) -> int:
+        cached = cache.get(self.count_key)
+        if cached is None:
+            estimate = self.get_estimated_count()
+            if (
+                estimate is not None
+                and estimate >= settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD
+            ):
+                cached = (estimate, True)
+            else:
+                cached = (super().count, False)
+            cache.set(
+                self.count_key,
+                cached,
+                settings.PAGINATION_COUNT_CACHE_TIMEOUT
+            )
+        count, self.count_is_estimated = cached
+        return count
+
+    def get_estimated_count(self):
+        """Оценка числа строк таблицы по статистике планировщика."""
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if (
+            connection.vendor != 'postgresql'
+            or queryset.query.has_filters()
+        ):
+            return None
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if not self.count_is_estimated:
+                raise
+            return int(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.count_is_estimated:
+            return super().page(number)
+
+        # Оценка может быть меньше реального числа строк,
+        # поэтому срез не обрезается по count.
+        bottom = (number - 1) * self.per_page
+        return self._get_page(
+            self.object_list[bottom:bottom + self.per_page], number, self
+        )
+
+
+class EstimatedCountPagination(CustomPagination):
+    """
+    Вариант CustomPagination с кэшированным или оценочным количеством.
+
+    Количество кэшируется по нормализованным параметрам фильтрации
+    и версиям таблиц представления (cache_versions), поэтому изменение
+    рецептов сразу сбрасывает кэш. В ответе поле count_estimated
+    показывает, точное ли значение count.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.view = view
+        return super().paginate_queryset(queryset, request, view)
+
+    def django_paginator_class(self, queryset, page_size):
+        request = self.request
+        count_key = make_cache_key(
+            'count',
+            request.path,
+            request.user.pk,
+            normalize_query_params(
+                request, exclude=PAGINATION_PARAMS + ('fields', 'omit')
+            ),
+            get_view_versions(request, self.view),
+        )
+        return CachedCountPaginator(queryset, page_size, count_key)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return Response({
+            'count': self.page.paginator.count,
+            'count_estimated': self.page.paginator.count_is_estimated,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
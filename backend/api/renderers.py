@@ -0,0 +1,78 @@
+import csv
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """
+    Базовый рендерер списка покупок.
+
+    Строки списка выдаются по одной методом stream(), чтобы ответ можно
+    было отдавать через StreamingHttpResponse, не собирая его в памяти.
+    Каждая строка — словарь с ключами name, measurement_unit и amount.
+    """
+
+    charset = 'utf-8'
+    filename = 'shopping-list'
+
+    def stream(self, rows):
+        raise NotImplementedError
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            # Ошибки DRF (например, 401) рендерятся тем же рендерером.
+            return self.render_error(data).encode(self.charset)
+        return ''.join(self.stream(data)).encode(self.charset)
+
+    def render_error(self, data) -> str:
+        return str(data.get('detail', data))
+
+    def get_filename(self) -> str:
+        return f'{self.filename}.{self.format}'
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, rows):
+        yield 'Список покупок:\n\n'
+        for row in rows:
+            yield (
+                f'{row["name"]}, {row["amount"]}'
+                f'{row["measurement_unit"]}\n'
+            )
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    header = ('name', 'amount', 'measurement_unit')
+
+    class Echo:
+        """Буфер для csv.writer, который сразу возвращает строку."""
+
+        def write(self, value):
+            return value
+
+    def stream(self, rows):
+        writer = csv.writer(self.Echo())
+        yield writer.writerow(self.header)
+        for row in rows:
+            yield writer.writerow([row[name] for name in self.header])
+
+
+class ShoppingListJSONRenderer(ShoppingListRenderer):
+    media_type = 'application/json'
+    format = 'json'
+
+    def render_error(self, data) -> str:
+        return json.dumps(data, ensure_ascii=False)
+
+    def stream(self, rows):
+        separator = '['
+        for row in rows:
+            yield separator + json.dumps(row, ensure_ascii=False)
+            separator = ',\n'
+        yield '[]' if separator == '[' else ']'
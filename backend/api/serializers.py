@@ -1,18 +1,32 @@
-from drf_extra_fields.fields import Base64ImageField
+import json
+from collections import Counter
+
 from rest_framework import serializers
 from rest_framework.serializers import ModelSerializer, SerializerMethodField
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
-from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.http import QueryDict
 
 from api.config.config import COOKING_TIME, ONE_OR_MORE_INGREDIENTS
+from api.fields import RecipeImageField
+from api.mixins import SparseFieldsetMixin
+from api.utils.bookkeeping import explicit_bookkeeping
+from api.utils.cache_utils import bump_versions
+from api.utils.recipe_ingredient_index import update_recipe_ingredient_index
 from api.utils.serializers_utils import (
-    is_recipe_favorited,
-    is_recipe_in_shopping_cart,
+    get_image_variant_urls,
+    get_recipe_user_flag,
+    parse_multipart_recipe,
+    prefetch_recipe_ingredients,
+    validate_ingredients_exist,
     validate_tags,
     validate_unique_ingredients,
 )
+from api.utils.shopping_list import propagate_recipe_amounts
 from baseapp.models import Ingredient, Recipe, RecipeIngredients, Tag
 from users.models import Subscription
 
@@ -23,12 +37,30 @@ User = get_user_model()
 class MiniRecipeSerializer(ModelSerializer):
     """Укороченный сериализатор для модели Recipe."""
 
+    images = SerializerMethodField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
+
+    def get_images(self, obj) -> dict:
+        """Адреса уменьшенных копий картинки."""
+        return get_image_variant_urls(
+            obj.image_variants, self.context.get('request')
+        )
+
 
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список идентификаторов рецептов для массовых действий."""
 
-class UserSerializer(ModelSerializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_ACTION_MAX_SIZE,
+    )
+
+
+class UserSerializer(SparseFieldsetMixin, ModelSerializer):
     """Сериализатор для модели User."""
 
     is_subscribed = SerializerMethodField()
@@ -68,6 +100,8 @@ class UserSerializer(ModelSerializer):
         Преобразует модель пользователя в представление.
         """
         representation = super().to_representation(instance)
+        if 'recipes' not in self.fields:
+            return representation
 
         recipes = MiniRecipeSerializer(
             instance.recipes.all(), many=True, context=self.context
@@ -121,7 +155,47 @@ class SubscriptionSerializer(UserSerializer):
         return serializer.data
 
 
-class TagSerializer(ModelSerializer):
+class RecipeAuthorSerializer(serializers.Serializer):
+    """
+    Облегченный сериализатор автора для вложения в рецепт.
+
+    Получает рецепт целиком (source='*'), чтобы брать признак подписки
+    из аннотации queryset рецептов. Рецепты автора не выводятся.
+    """
+
+    email = serializers.EmailField(source='author.email')
+    id = serializers.IntegerField(source='author_id')
+    username = serializers.CharField(source='author.username')
+    first_name = serializers.CharField(source='author.first_name')
+    last_name = serializers.CharField(source='author.last_name')
+    is_subscribed = SerializerMethodField()
+
+    def get_is_subscribed(self, obj) -> bool:
+        """Проверяет, подписан ли пользователь на автора рецепта."""
+        return get_recipe_user_flag(
+            obj, 'author_subscribed_by_user', self.context.get('request')
+        )
+
+
+class FastValuesListMixin:
+    """
+    Быстрая сериализация списка простых моделей через .values().
+
+    Подходит только для сериализаторов, поля которых совпадают
+    с полями модели без преобразований.
+    """
+
+    @classmethod
+    def fast_list_representation(cls, objects, context) -> list:
+        fields = cls.Meta.fields
+        if hasattr(objects, 'values'):
+            return list(objects.values(*fields))
+        return [
+            {name: getattr(obj, name) for name in fields} for obj in objects
+        ]
+
+
+class TagSerializer(FastValuesListMixin, ModelSerializer):
     """Сериализатор для модели Tag."""
 
     class Meta:
@@ -129,7 +203,7 @@ class TagSerializer(ModelSerializer):
         fields = ('id', 'name', 'color')
 
 
-class IngredientSerializer(ModelSerializer):
+class IngredientSerializer(FastValuesListMixin, ModelSerializer):
     """Сериализатор для модели Ingredient."""
 
     class Meta:
@@ -180,10 +254,34 @@ class CreateUpdateRecipeIngredientsSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeListSerializer(serializers.ListSerializer):
+    """
+    Списочный сериализатор рецептов.
+
+    Рецепты с готовым документом выводятся из него. Для остальных
+    автор, теги и ингредиенты догружаются пачкой, по одному запросу
+    на каждую связь.
+    """
+
+    def to_representation(self, data) -> list:
+        recipes = list(data.all() if hasattr(data, 'all') else data)
+        missing = [
+            recipe for recipe in recipes
+            if not recipe.__dict__.get('document')
+        ]
+        fields = self.child.fields
+        lookups = [name for name in ('author', 'tags') if name in fields]
+        if missing and lookups:
+            prefetch_related_objects(missing, *lookups)
+        if 'ingredients' in fields:
+            prefetch_recipe_ingredients(missing)
+        return super().to_representation(recipes)
+
+
+class RecipeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Сериализатор для модели Recipe."""
 
-    author = UserSerializer(read_only=True)
+    author = RecipeAuthorSerializer(source='*', read_only=True)
     tags = TagSerializer(many=True)
     ingredients = serializers.SerializerMethodField(
         method_name='get_ingredients'
@@ -194,6 +292,7 @@ class RecipeSerializer(serializers.ModelSerializer):
     is_in_shopping_cart = serializers.SerializerMethodField(
         method_name='get_is_in_shopping_cart'
     )
+    images = serializers.SerializerMethodField(method_name='get_images')
 
     class Meta:
         model = Recipe
@@ -202,6 +301,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             'name',
             'author',
             'image',
+            'images',
             'text',
             'ingredients',
             'tags',
@@ -209,28 +309,123 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_favorited',
             'is_in_shopping_cart',
         )
+        list_serializer_class = RecipeListSerializer
+
+    def to_representation(self, instance) -> dict:
+        """
+        Преобразует рецепт в представление.
+
+        Если у рецепта есть готовый документ, ответ собирается из него,
+        а поля пользователя и абсолютный адрес картинки подставляются
+        на лету.
+        """
+        document = instance.__dict__.get('document')
+        if not document or self.context.get('ignore_document'):
+            return super().to_representation(instance)
+
+        return self.document_to_representation(
+            instance,
+            json.loads(document),
+            list(self.fields),
+            self.context.get('request'),
+        )
+
+    @staticmethod
+    def document_to_representation(recipe, document, names, request) -> dict:
+        """
+        Собирает представление рецепта из готового документа.
+
+        Args:
+            recipe (Recipe): Рецепт с аннотациями флагов пользователя.
+            document (dict): Разобранный документ рецепта.
+            names (list): Выводимые поля в порядке сериализатора.
+            request: Запрос.
+
+        Returns:
+            dict: Представление рецепта.
+        """
+        representation = {}
+        for name in names:
+            if name == 'author':
+                representation[name] = {
+                    **document[name],
+                    'is_subscribed': get_recipe_user_flag(
+                        recipe, 'author_subscribed_by_user', request
+                    ),
+                }
+            elif name == 'image' and document[name] and request:
+                representation[name] = request.build_absolute_uri(
+                    document[name]
+                )
+            elif name == 'images':
+                representation[name] = get_image_variant_urls(
+                    recipe.image_variants, request
+                )
+            elif name == 'is_favorited':
+                representation[name] = get_recipe_user_flag(
+                    recipe, 'favorited_by_user', request
+                )
+            elif name == 'is_in_shopping_cart':
+                representation[name] = get_recipe_user_flag(
+                    recipe, 'in_user_shopping_cart', request
+                )
+            else:
+                representation[name] = document[name]
+        return representation
+
+    @classmethod
+    def fast_list_representation(cls, recipes, context) -> list:
+        """
+        Быстро сериализует список рецептов без полей DRF.
+
+        Рецепты с документом собираются из него напрямую, остальные
+        проходят через обычный списочный сериализатор.
+        """
+        request = context.get('request')
+        names = list(cls(context=context).fields)
+        recipes = list(recipes)
+        missing = [
+            recipe for recipe in recipes
+            if not recipe.__dict__.get('document')
+        ]
+        rendered = dict(zip(
+            (recipe.pk for recipe in missing),
+            cls(missing, many=True, context=context).data,
+        )) if missing else {}
+
+        return [
+            rendered[recipe.pk] if recipe.pk in rendered
+            else cls.document_to_representation(
+                recipe, json.loads(recipe.document), names, request
+            )
+            for recipe in recipes
+        ]
 
     def get_ingredients(self, obj) -> list:
-        """Получает список ингредиентов для рецепта."""
-        ingredients = RecipeIngredients.objects.filter(recipe=obj)
-        serializer = RecipeIngredientsSerializer(ingredients, many=True)
+        """Получает список ингредиентов для рецепта из кэша prefetch."""
+        prefetch_recipe_ingredients([obj])
+        serializer = RecipeIngredientsSerializer(
+            obj.recipeingredients_set.all(), many=True
+        )
         return serializer.data
 
+    def get_images(self, obj) -> dict:
+        """Адреса уменьшенных копий картинки."""
+        return get_image_variant_urls(
+            obj.image_variants, self.context.get('request')
+        )
+
     def get_is_favorited(self, obj):
         """Проверяет, добавлен ли рецепт в избранное пользователем."""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            user = request.user
-            return is_recipe_favorited(user, obj)
-        return False
+        return get_recipe_user_flag(
+            obj, 'favorited_by_user', self.context.get('request')
+        )
 
     def get_is_in_shopping_cart(self, obj):
         """Проверяет, добавлен ли рецепт в список покупок пользователя."""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            current_user = request.user
-            return is_recipe_in_shopping_cart(current_user, obj)
-        return False
+        return get_recipe_user_flag(
+            obj, 'in_user_shopping_cart', self.context.get('request')
+        )
 
 
 class RecipeCreateUpdateSerializer(ModelSerializer):
@@ -239,13 +434,13 @@ class RecipeCreateUpdateSerializer(ModelSerializer):
     позволяющий создавать, обновлять рецепты.
     """
 
-    author = UserSerializer(read_only=True)
+    author = RecipeAuthorSerializer(source='*', read_only=True)
     tags = serializers.PrimaryKeyRelatedField(
         queryset=Tag.objects.all(),
         many=True
     )
     ingredients = CreateUpdateRecipeIngredientsSerializer(many=True)
-    image = Base64ImageField()
+    image = RecipeImageField()
     cooking_time = serializers.IntegerField(
         validators=(
             MinValueValidator(
@@ -270,13 +465,19 @@ class RecipeCreateUpdateSerializer(ModelSerializer):
             'is_in_shopping_cart',
         )
 
+    def to_internal_value(self, data):
+        """Приводит данные multipart/form-data к виду JSON-запроса."""
+        if isinstance(data, QueryDict):
+            data = parse_multipart_recipe(data)
+        return super().to_internal_value(data)
+
     def validate_tags(self, value) -> list:
         """Проверяет, что список тегов не пуст."""
         return validate_tags(value)
 
     def validate_ingredients(self, value) -> list:
-        """Проверяет, что ингредиенты уникальны."""
-        return validate_unique_ingredients(value)
+        """Проверяет, что ингредиенты уникальны и существуют."""
+        return validate_ingredients_exist(validate_unique_ingredients(value))
 
     def create(self, validated_data: dict) -> Recipe:
         """
@@ -292,18 +493,27 @@ class RecipeCreateUpdateSerializer(ModelSerializer):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
 
-        recipe = Recipe.objects.create(author=author, **validated_data)
-        recipe.tags.set(tags)
-
-        for ingredient in ingredients:
-            amount = ingredient['amount']
-            ingredient = get_object_or_404(Ingredient, pk=ingredient['id'])
-
-            RecipeIngredients.objects.create(
-                recipe=recipe,
-                ingredient=ingredient,
-                amount=amount
+        with transaction.atomic():
+            recipe = Recipe.objects.create(author=author, **validated_data)
+            recipe.tags.set(tags)
+            RecipeIngredients.objects.bulk_create(
+                RecipeIngredients(
+                    recipe=recipe,
+                    ingredient_id=ingredient['id'],
+                    amount=ingredient['amount'],
+                )
+                for ingredient in ingredients
             )
+            # bulk_create не вызывает post_save, версию обновляем сами.
+            bump_versions('recipeingredients')
+        # Новый рецепт еще не может быть ни в чьем избранном или корзине,
+        # а на самого себя автор подписаться не может.
+        recipe.favorited_by_user = False
+        recipe.in_user_shopping_cart = False
+        recipe.author_subscribed_by_user = False
+        update_recipe_ingredient_index(
+            recipe.pk, (ingredient['id'] for ingredient in ingredients)
+        )
 
         return recipe
 
@@ -318,57 +528,74 @@ class RecipeCreateUpdateSerializer(ModelSerializer):
         Returns:
             Recipe: Обновленный рецепт.
         """
-        if 'ingredients' in validated_data:
-            ingredients = validated_data.pop('ingredients')
-            RecipeIngredients.objects.filter(recipe=recipe).delete()
-            self.add_recipe_ingredients(ingredients, recipe)
-        if 'tags' in validated_data:
-            tags_data = validated_data.pop('tags')
-            recipe.tags.set(tags_data)
-        return super().update(recipe, validated_data)
-
-    def add_recipe_ingredients(self, ingredients, recipe):
+        with transaction.atomic():
+            if 'ingredients' in validated_data:
+                self.update_recipe_ingredients(
+                    recipe, validated_data.pop('ingredients')
+                )
+            if 'tags' in validated_data:
+                tags_data = validated_data.pop('tags')
+                recipe.tags.set(tags_data)
+            return super().update(recipe, validated_data)
+
+    def update_recipe_ingredients(self, recipe, ingredients):
         """
-        Добавляет ингредиенты к рецепту.
+        Приводит ингредиенты рецепта к новому списку.
+
+        Новый список сравнивается с текущими строками, и разница
+        применяется не более чем тремя запросами: bulk_create,
+        bulk_update и DELETE. Неизменившиеся строки не трогаются.
 
         Args:
-            ingredients (list): Список ингредиентов.
             recipe (Recipe): Рецепт.
+            ingredients (list): Новый список ингредиентов.
         """
-        for ingredient in ingredients:
-            ingredient_id = ingredient['id']
-            amount = ingredient['amount']
-            ingredient_instance = get_object_or_404(
-                Ingredient,
-                pk=ingredient_id
-            )
-
-            if RecipeIngredients.objects.filter(
-                    recipe=recipe,
-                    ingredient=ingredient_instance,
-            ).exists():
-                current_amount = RecipeIngredients.objects.get(
-                    recipe=recipe,
-                    ingredient=ingredient_instance
-                ).amount
-                new_amount = current_amount + amount
-                if new_amount > 0:
-                    RecipeIngredients.objects.update_or_create(
-                        recipe=recipe,
-                        ingredient=ingredient_instance,
-                        defaults={'amount': new_amount},
-                    )
-                else:
-                    RecipeIngredients.objects.filter(
-                        recipe=recipe,
-                        ingredient=ingredient_instance
-                    ).delete()
+        new_amounts = {item['id']: item['amount'] for item in ingredients}
+        old_amounts = Counter()
+        current = {}
+        to_delete = []
+        for row in RecipeIngredients.objects.select_for_update().filter(
+            recipe=recipe
+        ).only('ingredient_id', 'amount'):
+            old_amounts[row.ingredient_id] += row.amount
+            if (
+                row.ingredient_id in current
+                or row.ingredient_id not in new_amounts
+            ):
+                to_delete.append(row.pk)
             else:
-                RecipeIngredients.objects.update_or_create(
-                    recipe=recipe,
-                    ingredient=ingredient_instance,
-                    defaults={'amount': amount},
-                )
+                current[row.ingredient_id] = row
+
+        to_update = []
+        for ingredient_id, row in current.items():
+            if row.amount != new_amounts[ingredient_id]:
+                row.amount = new_amounts[ingredient_id]
+                to_update.append(row)
+        to_create = [
+            RecipeIngredients(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
+            )
+            for ingredient_id, amount in new_amounts.items()
+            if ingredient_id not in current
+        ]
+        if not (to_create or to_update or to_delete):
+            return
+
+        # Списки покупок и документ обновляются ниже одним разом
+        # для всех строк, обработчики удаления их не трогают.
+        with explicit_bookkeeping(RecipeIngredients):
+            if to_delete:
+                RecipeIngredients.objects.filter(pk__in=to_delete).delete()
+            if to_update:
+                RecipeIngredients.objects.bulk_update(to_update, ('amount',))
+            if to_create:
+                RecipeIngredients.objects.bulk_create(to_create)
+        # bulk_update и bulk_create не вызывают сигналы, версию
+        # обновляем сами.
+        bump_versions('recipeingredients')
+        propagate_recipe_amounts(recipe.pk, old_amounts, new_amounts)
+        if to_create or to_delete:
+            update_recipe_ingredient_index(recipe.pk, new_amounts)
 
     def to_representation(self, instance) -> dict:
         """
@@ -0,0 +1,251 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from api.utils.bookkeeping import is_handled_explicitly
+from api.utils.cache_utils import bump_versions
+from api.utils.images import (
+    delete_image_variants,
+    enqueue_image_variants,
+    needs_image_variants,
+)
+from api.utils.membership import update_recipe_membership
+from api.utils.recipe_ingredient_index import update_recipe_ingredient_index
+from api.utils.search import update_recipe_search_vectors
+from api.utils.shopping_list import (
+    change_shopping_list,
+    propagate_recipe_amounts,
+)
+from baseapp.documents import (
+    rebuild_recipe_documents,
+    recipe_documents_rebuilt,
+)
+from baseapp.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredients,
+    ShoppingCart,
+    Tag,
+)
+from users.models import Subscription
+
+
+User = get_user_model()
+
+RELATED_RECIPE_LOOKUPS = {
+    Tag: 'tags',
+    Ingredient: 'recipeingredients__ingredient',
+    User: 'author',
+}
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(recipe_documents_rebuilt, sender=Recipe)
+def recipe_changed(sender, **kwargs):
+    """
+    Обновляет версию рецептов при любом их изменении, в том числе
+    после пересборки документов.
+    """
+    bump_versions('recipe')
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, update_fields=None, **kwargs):
+    """Пересчитывает поисковый вектор рецепта."""
+    if update_fields is not None and not {'name', 'text'} & set(
+        update_fields
+    ):
+        return
+    update_recipe_search_vectors(Recipe.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(sender, instance, **kwargs):
+    """Ставит в очередь построение вариантов новой картинки."""
+    if needs_image_variants(instance):
+        enqueue_image_variants(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    """Убирает удаленный рецепт из индекса ингредиентов процесса."""
+    update_recipe_ingredient_index(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_image_variants_deleted(sender, instance, **kwargs):
+    """Удаляет варианты картинки удаленного рецепта."""
+    variants = instance.image_variants
+    transaction.on_commit(lambda: delete_image_variants(variants))
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredients)
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=Tag)
+def recipe_related_changed(sender, **kwargs):
+    """Обновляет версию таблицы, данные которой выводятся в рецептах."""
+    bump_versions(sender.__name__.lower())
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredients)
+def recipe_ingredients_changed(sender, instance, **kwargs):
+    """
+    Пересобирает документ рецепта после изменения его ингредиента
+    через ORM или админку.
+
+    Документ пересобирается после фиксации транзакции, поэтому
+    при каскадном удалении рецепта пересобирать уже нечего.
+    """
+    if is_handled_explicitly(sender):
+        return
+    recipe_id = instance.recipe_id
+    transaction.on_commit(
+        lambda: rebuild_recipe_documents(
+            Recipe.objects.filter(pk=recipe_id)
+        )
+    )
+
+
+@receiver((post_save, post_delete), sender=User)
+def user_changed(sender, update_fields=None, **kwargs):
+    """
+    Обновляет версию пользователей.
+
+    Сохранение только last_login при входе не меняет выводимых данных.
+    """
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    bump_versions('user')
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=User)
+def rebuild_related_documents(sender, instance, update_fields=None, **kwargs):
+    """
+    Пересобирает документы рецептов, в которые выводится
+    измененный тег, ингредиент или автор.
+
+    Идентификаторы рецептов собираются сразу (до удаления тега),
+    а документы пересобираются после фиксации транзакции.
+    """
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    recipe_ids = list(
+        Recipe.objects.filter(
+            **{RELATED_RECIPE_LOOKUPS[sender]: instance}
+        ).values_list('pk', flat=True)
+    )
+    if recipe_ids:
+        transaction.on_commit(
+            lambda: rebuild_recipe_documents(
+                Recipe.objects.filter(pk__in=recipe_ids)
+            )
+        )
+
+
+@receiver(post_save, sender=ShoppingCart)
+def shopping_cart_added(sender, instance, created, **kwargs):
+    """Добавляет ингредиенты рецепта в список покупок пользователя."""
+    if created:
+        change_shopping_list(instance.user_id, (instance.recipe_id,))
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def shopping_cart_removed(sender, instance, **kwargs):
+    """
+    Убирает ингредиенты рецепта из списка покупок пользователя.
+
+    Обработчик срабатывает до удаления, поэтому при каскадном удалении
+    рецепта его ингредиенты еще есть в базе.
+    """
+    if is_handled_explicitly(sender):
+        return
+    change_shopping_list(instance.user_id, (instance.recipe_id,), sign=-1)
+
+
+@receiver(pre_save, sender=RecipeIngredients)
+def recipe_ingredient_saving(sender, instance, **kwargs):
+    """Запоминает строку ингредиента рецепта до изменения."""
+    instance._stored_row = RecipeIngredients.objects.filter(
+        pk=instance.pk
+    ).values_list(
+        'recipe_id', 'ingredient_id', 'amount'
+    ).first() if instance.pk else None
+
+
+@receiver(post_save, sender=RecipeIngredients)
+def recipe_ingredient_saved(sender, instance, **kwargs):
+    """
+    Переносит изменение ингредиента рецепта, сделанное через ORM
+    или админку, в списки покупок.
+    """
+    changes = {instance.recipe_id: ({}, {
+        instance.ingredient_id: instance.amount
+    })}
+    stored = instance.__dict__.pop('_stored_row', None)
+    if stored is not None:
+        recipe_id, ingredient_id, amount = stored
+        old, _ = changes.setdefault(recipe_id, ({}, {}))
+        old[ingredient_id] = amount
+    for recipe_id, (old, new) in changes.items():
+        propagate_recipe_amounts(recipe_id, old, new)
+
+
+@receiver(post_delete, sender=RecipeIngredients)
+def recipe_ingredient_deleted(sender, instance, origin=None, **kwargs):
+    """
+    Убирает удаленный ингредиент рецепта из списков покупок.
+
+    Каскадное удаление вместе с рецептом (или его автором)
+    не учитывается: ингредиенты рецепта уже убрал из списков
+    shopping_cart_removed.
+    """
+    if is_handled_explicitly(sender):
+        return
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if model is not RecipeIngredients:
+        return
+    propagate_recipe_amounts(
+        instance.recipe_id, {instance.ingredient_id: instance.amount}, {}
+    )
+
+
+@receiver((post_save, post_delete), sender=Subscription)
+def user_relation_changed(sender, instance, **kwargs):
+    """Обновляет версию подписок пользователя."""
+    bump_versions(f'{sender.__name__.lower()}:{instance.user_id}')
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def recipe_membership_added(sender, instance, created, **kwargs):
+    """Добавляет рецепт в кэш избранного или корзины пользователя."""
+    if created:
+        update_recipe_membership(
+            sender.__name__.lower(), instance.user_id,
+            added=(instance.recipe_id,),
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def recipe_membership_removed(sender, instance, **kwargs):
+    """Удаляет рецепт из кэша избранного или корзины пользователя."""
+    if is_handled_explicitly(sender):
+        return
+    update_recipe_membership(
+        sender.__name__.lower(), instance.user_id,
+        removed=(instance.recipe_id,),
+    )
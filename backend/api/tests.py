@@ -0,0 +1,1066 @@
+import csv
+import json
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from rest_framework.test import APITestCase
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+
+from api.serializers import RecipeSerializer
+from api.utils.units import (
+    UNCONVERTED_UNITS,
+    aggregate_normalized_amounts,
+    get_unit_table,
+    normalize_unit,
+    to_display_units,
+)
+from api.utils.utils import lock_user_links
+from baseapp.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredients,
+    ShoppingCart,
+    ShoppingListItem,
+    Tag,
+)
+
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA'
+    'DUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=='
+)
+OTHER_IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAIAAACQd1PeAAAA'
+    'DElEQVR4nGP4z8AAAAMBAQDJ/pLvAAAAAElFTkSuQmCC'
+)
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'versions': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'versions',
+        },
+    },
+    MEDIA_ROOT=MEDIA_ROOT,
+    IMAGE_PIPELINE='off',
+)
+class ApiTestCase(APITestCase):
+    """
+    Общие данные тестов API: автор, читатель, тэги, ингредиенты.
+
+    Кэш — в памяти процесса, картинки — во временном каталоге.
+    Запросы, которые пишут в базу, выполняются внутри
+    captureOnCommitCallbacks, чтобы сработали обработчики on_commit
+    (версии кэша, индексы, сводный список покупок).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.org', username='author',
+            first_name='Автор', last_name='Рецептов',
+        )
+        cls.reader = User.objects.create_user(
+            email='reader@example.org', username='reader',
+            first_name='Читатель', last_name='Рецептов',
+        )
+        cls.breakfast = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast'
+        )
+        cls.dinner = Tag.objects.create(
+            name='Ужин', color='#8775D2', slug='dinner'
+        )
+        cls.flour = Ingredient.objects.create(
+            name='мука', measurement_unit='г'
+        )
+        cls.milk = Ingredient.objects.create(
+            name='молоко', measurement_unit='мл'
+        )
+        cls.eggs = Ingredient.objects.create(
+            name='яйца', measurement_unit='шт.'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        for alias in ('default', 'versions'):
+            caches[alias].clear()
+        self.client.force_authenticate(self.author)
+
+    def write(self, method, url, data=None, **kwargs):
+        """Выполнить запрос с выполнением обработчиков on_commit."""
+        kwargs.setdefault('format', 'json')
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(self.client, method)(url, data, **kwargs)
+
+    def recipe_payload(self, **fields) -> dict:
+        payload = {
+            'name': 'Блины',
+            'text': 'Смешать и пожарить.',
+            'cooking_time': 20,
+            'image': IMAGE,
+            'tags': [self.breakfast.pk],
+            'ingredients': [
+                {'id': self.flour.pk, 'amount': 200},
+                {'id': self.milk.pk, 'amount': 500},
+            ],
+        }
+        payload.update(fields)
+        return payload
+
+    def create_recipe(self, **fields) -> Recipe:
+        response = self.write(
+            'post', '/api/recipes/', self.recipe_payload(**fields)
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        return Recipe.objects.get(pk=response.data['id'])
+
+    def get_recipe_ids(self, **params) -> list:
+        response = self.client.get('/api/recipes/', params)
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+
+class TagsMaskTests(ApiTestCase):
+    """Фильтр ?tags= по битовой маске Recipe.tags_mask."""
+
+    def test_patch_tags_updates_filter(self):
+        recipe = self.create_recipe()
+
+        response = self.write(
+            'patch', f'/api/recipes/{recipe.pk}/',
+            {'tags': [self.dinner.pk], 'name': 'Блины на ужин'},
+        )
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.get_recipe_ids(tags='dinner'), [recipe.pk])
+        self.assertEqual(self.get_recipe_ids(tags='breakfast'), [])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.tags_mask, self.dinner.mask)
+
+    def test_stale_save_keeps_denormalized_columns(self):
+        recipe = self.create_recipe()
+        stale = Recipe.objects.get(pk=recipe.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.tags.set([self.dinner])
+        stale.name = 'Другое название'
+        stale.save()
+
+        stale.refresh_from_db()
+        self.assertEqual(stale.tags_mask, self.dinner.mask)
+        self.assertEqual(stale.name, 'Другое название')
+
+    def test_assigned_denormalized_column_is_saved(self):
+        recipe = Recipe.objects.get(pk=self.create_recipe().pk)
+        document = recipe.document
+
+        recipe.image_variants = {'small': 'recipe/small.webp'}
+        recipe.save()
+        recipe.document = '{}'
+        recipe.save()
+
+        recipe = Recipe.objects.get(pk=recipe.pk)
+        self.assertEqual(recipe.document, '{}')
+        self.assertEqual(
+            recipe.image_variants, {'small': 'recipe/small.webp'}
+        )
+
+        recipe.document = document
+        recipe.refresh_from_db(fields=['name'])
+        recipe.save()
+        self.assertEqual(Recipe.objects.get(pk=recipe.pk).document, document)
+
+    def test_tag_without_bit(self):
+        lunch, = Tag.objects.bulk_create(
+            [Tag(name='Обед', color='#49B64E', slug='lunch')]
+        )
+        recipe = self.create_recipe()
+
+        self.assertEqual(lunch.mask, 0)
+        recipe.tags.add(lunch)
+        self.assertEqual(self.get_recipe_ids(tags='lunch'), [recipe.pk])
+
+        lunch.save()
+        recipe.refresh_from_db()
+        self.assertIsNotNone(lunch.bit)
+        self.assertEqual(
+            recipe.tags_mask, self.breakfast.mask | lunch.mask
+        )
+        self.assertEqual(self.get_recipe_ids(tags='lunch'), [recipe.pk])
+
+
+class RecipeDocumentTests(ApiTestCase):
+    """Сохраненный документ рецепта и кэш ответов."""
+
+    def get_anonymous(self, url):
+        self.client.force_authenticate(None)
+        response = self.client.get(url)
+        self.client.force_authenticate(self.author)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_update_is_visible_in_cached_detail(self):
+        recipe = self.create_recipe()
+        url = f'/api/recipes/{recipe.pk}/'
+        self.get_anonymous(url)
+
+        self.write('patch', url, {'name': 'Оладьи'})
+
+        self.assertEqual(self.get_anonymous(url).data['name'], 'Оладьи')
+        recipe.refresh_from_db()
+        self.assertIn('Оладьи', recipe.document)
+
+    def test_orm_ingredient_change_rebuilds_document(self):
+        recipe = self.create_recipe()
+        url = f'/api/recipes/{recipe.pk}/'
+        self.get_anonymous(url)
+        row = RecipeIngredients.objects.get(
+            recipe=recipe, ingredient=self.milk
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            row.amount = 5
+            row.save()
+        amounts = {
+            item['id']: item['amount']
+            for item in self.get_anonymous(url).data['ingredients']
+        }
+        self.assertEqual(amounts, {self.flour.pk: 200, self.milk.pk: 5})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            row.delete()
+        ingredients = self.get_anonymous(url).data['ingredients']
+        self.assertEqual([item['id'] for item in ingredients], [self.flour.pk])
+
+    def test_document_matches_serializer(self):
+        recipe = self.create_recipe(tags=[self.breakfast.pk, self.dinner.pk])
+
+        data = RecipeSerializer(
+            Recipe.objects.get(pk=recipe.pk),
+            context={'ignore_document': True},
+        ).data
+        for name in ('images', 'is_favorited', 'is_in_shopping_cart'):
+            del data[name]
+        del data['author']['is_subscribed']
+
+        document = json.loads(recipe.document)
+        self.assertEqual(document, data)
+        self.assertEqual(list(document), list(data))
+
+
+class ShoppingListTests(ApiTestCase):
+    """Суммы ShoppingListItem при изменении ингредиентов рецептов."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.create_recipe()
+        ShoppingCart.objects.create(user=self.reader, recipe=self.recipe)
+
+    def get_shopping_list(self) -> dict:
+        call_command('check_shopping_lists', stdout=StringIO())
+        return dict(
+            ShoppingListItem.objects.filter(
+                user=self.reader
+            ).values_list('ingredient_id', 'amount')
+        )
+
+    def test_orm_changes(self):
+        row = RecipeIngredients.objects.get(
+            recipe=self.recipe, ingredient=self.milk
+        )
+        row.amount = 5
+        row.save()
+        RecipeIngredients.objects.create(
+            recipe=self.recipe, ingredient=self.eggs, amount=3
+        )
+        self.assertEqual(
+            self.get_shopping_list(),
+            {self.flour.pk: 200, self.milk.pk: 5, self.eggs.pk: 3},
+        )
+
+        row.ingredient = self.eggs
+        row.save()
+        RecipeIngredients.objects.filter(ingredient=self.flour).delete()
+        self.assertEqual(self.get_shopping_list(), {self.eggs.pk: 8})
+
+    def test_update_through_api(self):
+        pancakes = self.create_recipe(name='Оладьи', ingredients=[
+            {'id': self.flour.pk, 'amount': 100},
+        ])
+        ShoppingCart.objects.create(user=self.reader, recipe=pancakes)
+
+        response = self.write(
+            'patch', f'/api/recipes/{self.recipe.pk}/',
+            {'ingredients': [
+                {'id': self.milk.pk, 'amount': 250},
+                {'id': self.eggs.pk, 'amount': 2},
+            ]},
+        )
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            self.get_shopping_list(),
+            {self.flour.pk: 100, self.milk.pk: 250, self.eggs.pk: 2},
+        )
+
+    def test_move_to_other_recipe(self):
+        other = self.create_recipe(name='Омлет', ingredients=[
+            {'id': self.eggs.pk, 'amount': 2},
+        ])
+        row = RecipeIngredients.objects.get(
+            recipe=self.recipe, ingredient=self.flour
+        )
+        row.recipe = other
+        row.save()
+        self.assertEqual(self.get_shopping_list(), {self.milk.pk: 500})
+
+    def test_cascade_delete(self):
+        self.recipe.delete()
+        self.assertEqual(self.get_shopping_list(), {})
+
+        self.create_recipe()
+        ShoppingCart.objects.create(
+            user=self.reader, recipe=Recipe.objects.get()
+        )
+        self.author.delete()
+        self.assertEqual(self.get_shopping_list(), {})
+
+
+class BulkActionsTests(ApiTestCase):
+    """Массовое добавление в корзину и удаление из нее."""
+
+    def test_bulk_shopping_cart(self):
+        first = self.create_recipe()
+        second = self.create_recipe(name='Оладьи')
+        ShoppingCart.objects.create(user=self.author, recipe=first)
+        url = '/api/recipes/shopping_cart/'
+        ids = [first.pk, second.pk, second.pk + 100]
+
+        response = self.write('post', url, {'recipes': ids})
+        self.assertEqual(
+            [item['status'] for item in response.data['results']],
+            ['already_linked', 'added', 'not_found'],
+        )
+        self.assertEqual(
+            dict(
+                ShoppingListItem.objects.filter(
+                    user=self.author
+                ).values_list('ingredient_id', 'amount')
+            ),
+            {self.flour.pk: 400, self.milk.pk: 1000},
+        )
+
+        response = self.write('delete', url, {'recipes': ids[1:]})
+        self.assertEqual(
+            [item['status'] for item in response.data['results']],
+            ['removed', 'not_found'],
+        )
+        call_command('check_shopping_lists', stdout=StringIO())
+        self.assertEqual(
+            ShoppingListItem.objects.filter(user=self.author).count(), 2
+        )
+
+    def test_repeated_bulk_add_counts_once(self):
+        first = self.create_recipe()
+        second = self.create_recipe(name='Оладьи')
+        url = '/api/recipes/shopping_cart/'
+
+        for expected in ('added', 'already_linked'):
+            response = self.write(
+                'post', url, {'recipes': [first.pk, second.pk]}
+            )
+            self.assertEqual(
+                [item['status'] for item in response.data['results']],
+                [expected, expected],
+            )
+            self.assertEqual(
+                dict(
+                    ShoppingListItem.objects.filter(
+                        user=self.author
+                    ).values_list('ingredient_id', 'amount')
+                ),
+                {self.flour.pk: 400, self.milk.pk: 1000},
+            )
+        self.assertEqual(
+            ShoppingCart.objects.filter(user=self.author).count(), 2
+        )
+
+    def test_bulk_add_locks_user(self):
+        recipe = self.create_recipe()
+
+        with mock.patch(
+            'api.utils.utils.lock_user_links',
+            wraps=lock_user_links,
+        ) as lock:
+            self.write(
+                'post', '/api/recipes/shopping_cart/',
+                {'recipes': [recipe.pk]},
+            )
+
+        lock.assert_called_once_with(self.author)
+
+
+@override_settings(MEMBERSHIP_CACHE_STATS=True)
+class MembershipStatsTests(ApiTestCase):
+    """Счетчики кэша избранного и корзины."""
+
+    def test_membership_stats_command(self):
+        self.create_recipe()
+        self.client.get('/api/recipes/')
+        self.client.get('/api/recipes/')
+
+        out = StringIO()
+        call_command('membership_stats', '--reset', stdout=out)
+
+        self.assertIn('Попаданий: 2\nПромахов: 2\n', out.getvalue())
+        call_command('membership_stats', stdout=out)
+        self.assertIn('Попаданий: 0\n', out.getvalue())
+
+
+class ImagePipelineTests(ApiTestCase):
+    """Построение вариантов картинки рецепта."""
+
+    @override_settings(IMAGE_PIPELINE='sync')
+    def test_sync_failure_does_not_break_response(self):
+        with mock.patch(
+            'api.utils.images.build_image_variants',
+            side_effect=OSError('диск заполнен'),
+        ), self.assertLogs('api.utils.images', 'ERROR'):
+            recipe = self.create_recipe()
+
+        self.assertTrue(Recipe.objects.filter(pk=recipe.pk).exists())
+
+
+class RecipeParsersTests(ApiTestCase):
+    """Форматы тела запросов к рецептам."""
+
+    def test_urlencoded_update(self):
+        recipe = self.create_recipe()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/recipes/{recipe.pk}/', 'cooking_time=15',
+                content_type='application/x-www-form-urlencoded',
+            )
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['cooking_time'], 15)
+
+
+# На PostgreSQL список добавляет оценку числа строк из pg_class,
+# а сохранение рецепта — пересчет поискового вектора.
+POSTGRES_EXTRA_QUERIES = int(connection.vendor == 'postgresql')
+
+
+class RecipeQueriesTests(ApiTestCase):
+    """
+    Число SQL-запросов к рецептам.
+
+    Кэш перед каждым замером пуст, поэтому считаются и запросы,
+    результат которых потом берется из кэша.
+    """
+
+    def assert_get_queries(self, url, expected):
+        for alias in ('default', 'versions'):
+            caches[alias].clear()
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list(self):
+        for _ in range(2):
+            self.create_recipe()
+        self.client.force_authenticate(self.reader)
+        # COUNT, рецепты, избранное и корзина пользователя.
+        self.assert_get_queries('/api/recipes/', 4 + POSTGRES_EXTRA_QUERIES)
+
+        for _ in range(4):
+            self.create_recipe()
+        response = self.assert_get_queries(
+            '/api/recipes/', 4 + POSTGRES_EXTRA_QUERIES
+        )
+        self.assertEqual(len(response.data['results']), 6)
+
+        self.client.force_authenticate(None)
+        self.assert_get_queries('/api/recipes/', 2 + POSTGRES_EXTRA_QUERIES)
+
+    def test_detail(self):
+        recipe = self.create_recipe()
+        self.client.force_authenticate(self.reader)
+        self.assert_get_queries(f'/api/recipes/{recipe.pk}/', 5)
+
+    def test_create(self):
+        with self.assertNumQueries(18 + POSTGRES_EXTRA_QUERIES):
+            self.create_recipe()
+
+    def test_update(self):
+        recipe = self.create_recipe()
+        with self.assertNumQueries(22 + POSTGRES_EXTRA_QUERIES):
+            response = self.write(
+                'patch', f'/api/recipes/{recipe.pk}/',
+                self.recipe_payload(
+                    name='Блины на кефире',
+                    ingredients=[
+                        {'id': self.flour.pk, 'amount': 250},
+                        {'id': self.eggs.pk, 'amount': 2},
+                    ],
+                ),
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+
+
+class CursorPaginationTests(ApiTestCase):
+    """?cursor= и параметры, упорядочивающие рецепты по релевантности."""
+
+    def get_page(self, **params):
+        response = self.client.get('/api/recipes/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_cursor_keeps_pub_date_order(self):
+        older = self.create_recipe()
+        newer = self.create_recipe(name='Оладьи')
+
+        page = self.get_page(cursor='')
+
+        self.assertNotIn('count', page)
+        self.assertEqual(
+            [recipe['id'] for recipe in page['results']],
+            [newer.pk, older.pk],
+        )
+
+    def test_search_ignores_cursor(self):
+        by_name = self.create_recipe(name='Блины')
+        by_text = self.create_recipe(
+            name='Оладьи', text='Тесто гуще, чем на Блины.'
+        )
+
+        page = self.get_page(search='Блины', cursor='')
+
+        self.assertEqual(page['count'], 2)
+        self.assertEqual(
+            [recipe['id'] for recipe in page['results']],
+            [by_name.pk, by_text.pk],
+        )
+
+    def test_have_ignores_cursor(self):
+        covered = self.create_recipe(
+            ingredients=[{'id': self.flour.pk, 'amount': 200}]
+        )
+        half_covered = self.create_recipe(name='Оладьи')
+
+        page = self.get_page(have=self.flour.pk, cursor='')
+
+        self.assertEqual(page['count'], 2)
+        self.assertEqual(
+            [recipe['id'] for recipe in page['results']],
+            [covered.pk, half_covered.pk],
+        )
+
+
+class SparseFieldsetTests(ApiTestCase):
+    """Параметры ?fields= и ?omit= корневого сериализатора."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.create_recipe()
+
+    def test_valid_subset(self):
+        for fast in (False, True):
+            with self.subTest(fast=fast), self.settings(
+                FAST_LIST_SERIALIZATION=fast
+            ):
+                response = self.client.get(
+                    '/api/recipes/', {'fields': 'id,name,tags'}
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    set(response.data['results'][0]), {'id', 'name', 'tags'}
+                )
+
+        response = self.client.get(
+            f'/api/recipes/{self.recipe.pk}/',
+            {'fields': 'id,name,text', 'omit': 'text'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {'id', 'name'})
+
+    def test_unknown_fields(self):
+        for fast in (False, True):
+            with self.subTest(fast=fast), self.settings(
+                FAST_LIST_SERIALIZATION=fast
+            ):
+                response = self.client.get(
+                    '/api/recipes/', {'fields': 'id,title,author__email'}
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(
+                    response.data,
+                    {'fields': ['Неизвестные поля: author__email, title.']},
+                )
+
+        response = self.client.get(
+            f'/api/recipes/{self.recipe.pk}/', {'omit': 'photo'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data, {'omit': ['Неизвестные поля: photo.']}
+        )
+
+
+class ConditionalGetTests(ApiTestCase):
+    """ETag и ответ 304 для списка и карточки рецепта."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.create_recipe()
+        self.urls = ('/api/recipes/', f'/api/recipes/{self.recipe.pk}/')
+
+    def get_etags(self) -> list:
+        etags = []
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            etags.append(response['ETag'])
+        return etags
+
+    def test_if_none_match(self):
+        for url, etag in zip(self.urls, self.get_etags()):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+                self.assertEqual(
+                    self.client.get(
+                        url, HTTP_IF_NONE_MATCH='"other"'
+                    ).status_code,
+                    200,
+                )
+
+    def test_etag_changes_after_write(self):
+        before = self.get_etags()
+        self.write(
+            'patch', f'/api/recipes/{self.recipe.pk}/',
+            self.recipe_payload(name='Блины на кефире'),
+        )
+        after = self.get_etags()
+
+        for url, old, new in zip(self.urls, before, after):
+            with self.subTest(url=url):
+                self.assertNotEqual(old, new)
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=old)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['ETag'], new)
+
+    def test_etag_changes_after_favorite(self):
+        before = self.get_etags()
+        self.write('post', f'/api/recipes/{self.recipe.pk}/favorite/')
+
+        for url, old, new in zip(self.urls, before, self.get_etags()):
+            with self.subTest(url=url):
+                self.assertNotEqual(old, new)
+
+
+class RecipeImageStorageTests(ApiTestCase):
+    """Общие файлы картинок с одинаковым содержимым."""
+
+    def assert_stored(self, name, exists=True):
+        storage = Recipe._meta.get_field('image').storage
+        self.assertEqual(storage.exists(name), exists)
+
+    def test_same_content_is_stored_once(self):
+        first = self.create_recipe()
+        second = self.create_recipe(name='Оладьи')
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assert_stored(first.image.name)
+
+    def test_file_is_deleted_with_last_recipe(self):
+        first = self.create_recipe()
+        second = self.create_recipe(name='Оладьи')
+        name = first.image.name
+
+        self.write('delete', f'/api/recipes/{first.pk}/')
+        self.assert_stored(name)
+
+        self.write('delete', f'/api/recipes/{second.pk}/')
+        self.assert_stored(name, exists=False)
+
+    def test_replaced_file_is_kept_while_used(self):
+        first = self.create_recipe()
+        second = self.create_recipe(name='Оладьи')
+        name = first.image.name
+
+        self.write(
+            'patch', f'/api/recipes/{first.pk}/',
+            self.recipe_payload(image=OTHER_IMAGE),
+        )
+        first.refresh_from_db()
+        self.assertNotEqual(first.image.name, name)
+        self.assert_stored(name)
+
+        self.write(
+            'patch', f'/api/recipes/{second.pk}/',
+            self.recipe_payload(name='Оладьи', image=OTHER_IMAGE),
+        )
+        self.assert_stored(name, exists=False)
+        self.assert_stored(first.image.name)
+
+
+class RecipeSearchTests(ApiTestCase):
+    """Полнотекстовый поиск ?search= по названию и описанию."""
+
+    def test_matches_are_ranked_by_name_first(self):
+        by_text = self.create_recipe(
+            name='Оладьи', text='Тесто гуще, чем на Блины.'
+        )
+        by_name = self.create_recipe(name='Блины')
+        self.create_recipe(name='Омлет', text='Взбить яйца с молоком.')
+
+        self.assertEqual(
+            self.get_recipe_ids(search='Блины'), [by_name.pk, by_text.pk]
+        )
+
+    def test_combined_with_filters(self):
+        breakfast = self.create_recipe(name='Блины')
+        self.create_recipe(name='Блины на ужин', tags=[self.dinner.pk])
+
+        self.assertEqual(
+            self.get_recipe_ids(search='Блины', tags='breakfast'),
+            [breakfast.pk],
+        )
+
+    def test_follows_recipe_update(self):
+        recipe = self.create_recipe(name='Оладьи')
+        self.assertEqual(self.get_recipe_ids(search='Блины'), [])
+
+        self.write(
+            'patch', f'/api/recipes/{recipe.pk}/',
+            self.recipe_payload(name='Блины'),
+        )
+
+        self.assertEqual(self.get_recipe_ids(search='Блины'), [recipe.pk])
+        self.assertEqual(self.get_recipe_ids(search='Оладьи'), [])
+
+
+class RecipeHaveTests(ApiTestCase):
+    """Подбор рецептов по продуктам: ?have= и ?exclude_ingredients=."""
+
+    def setUp(self):
+        super().setUp()
+        self.bread = self.create_recipe(
+            name='Лепешки',
+            ingredients=[{'id': self.flour.pk, 'amount': 300}],
+        )
+        self.pancakes = self.create_recipe()
+        self.omelet = self.create_recipe(
+            name='Омлет',
+            ingredients=[
+                {'id': self.eggs.pk, 'amount': 3},
+                {'id': self.milk.pk, 'amount': 100},
+            ],
+        )
+
+    def test_ranked_by_coverage(self):
+        self.assertEqual(
+            self.get_recipe_ids(have=self.flour.pk),
+            [self.bread.pk, self.pancakes.pk],
+        )
+        self.assertEqual(
+            self.get_recipe_ids(have=f'{self.eggs.pk},{self.milk.pk}'),
+            [self.omelet.pk, self.pancakes.pk],
+        )
+
+    def test_exclude_ingredients(self):
+        self.assertEqual(
+            self.get_recipe_ids(
+                have=self.flour.pk, exclude_ingredients=self.milk.pk
+            ),
+            [self.bread.pk],
+        )
+        self.assertEqual(
+            self.get_recipe_ids(exclude_ingredients=self.eggs.pk),
+            [self.pancakes.pk, self.bread.pk],
+        )
+
+    def test_follows_api_update(self):
+        self.write(
+            'patch', f'/api/recipes/{self.bread.pk}/',
+            self.recipe_payload(
+                name='Лепешки',
+                ingredients=[{'id': self.eggs.pk, 'amount': 2}],
+            ),
+        )
+
+        self.assertEqual(
+            self.get_recipe_ids(have=self.flour.pk), [self.pancakes.pk]
+        )
+        self.assertEqual(
+            self.get_recipe_ids(have=self.eggs.pk),
+            [self.bread.pk, self.omelet.pk],
+        )
+
+    @override_settings(RECIPE_INGREDIENT_INDEX_MAX_AGE=0)
+    def test_follows_orm_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeIngredients.objects.filter(
+                recipe=self.pancakes, ingredient=self.flour
+            ).delete()
+
+        self.assertEqual(
+            self.get_recipe_ids(have=self.flour.pk), [self.bread.pk]
+        )
+        self.assertEqual(
+            self.get_recipe_ids(have=self.milk.pk),
+            [self.pancakes.pk, self.omelet.pk],
+        )
+
+
+class IngredientPrefixSearchTests(ApiTestCase):
+    """Поиск ?name= по индексу в памяти совпадает с istartswith."""
+
+    PREFIXES = ('м', 'М', 'МУК', 'мУкА', 'Мё', 'mil', 'MOL', 'я', 'ж')
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for name in (
+            'Мука пшеничная', 'МУКА РЖАНАЯ', 'мускатный орех', 'Мёд',
+            'Milk powder', 'molasses', 'Яблоки',
+        ):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+
+    def get_ids(self, prefix) -> list:
+        response = self.client.get('/api/ingredients/', {'name': prefix})
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data]
+
+    def test_matches_istartswith(self):
+        # LIKE в SQLite не учитывает регистр только для латиницы.
+        case_folding = connection.vendor == 'postgresql'
+        for prefix in self.PREFIXES:
+            with self.subTest(prefix=prefix):
+                if not (prefix.isascii() or case_folding):
+                    self.skipTest('нужен PostgreSQL')
+                self.assertEqual(
+                    self.get_ids(prefix),
+                    list(
+                        Ingredient.objects.filter(
+                            name__istartswith=prefix
+                        ).order_by('id').values_list('id', flat=True)
+                    ),
+                )
+
+    def test_cyrillic_case_folding(self):
+        for prefix in self.PREFIXES:
+            with self.subTest(prefix=prefix):
+                self.assertEqual(
+                    self.get_ids(prefix),
+                    sorted(
+                        ingredient.pk
+                        for ingredient in Ingredient.objects.all()
+                        if ingredient.name.lower().startswith(
+                            prefix.lower()
+                        )
+                    ),
+                )
+
+
+class FastListTests(ApiTestCase):
+    """
+    Быстрый путь FastListMixin выводит то же, что и сериализаторы.
+
+    Образец — ответы с выключенным FAST_LIST_SERIALIZATION
+    и стертыми документами, то есть собранные полями DRF целиком.
+    """
+
+    LIST_URLS = (
+        '/api/recipes/',
+        '/api/recipes/?fields=id,name,image,is_favorited',
+        '/api/recipes/?omit=text,ingredients',
+        '/api/tags/',
+        '/api/ingredients/',
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.pancakes = self.create_recipe()
+        self.omelette = self.create_recipe(
+            name='Омлет',
+            tags=[self.breakfast.pk, self.dinner.pk],
+            ingredients=[
+                {'id': self.eggs.pk, 'amount': 3},
+                {'id': self.milk.pk, 'amount': 50},
+            ],
+        )
+        Favorite.objects.create(user=self.reader, recipe=self.pancakes)
+        ShoppingCart.objects.create(user=self.reader, recipe=self.omelette)
+
+    def get_json(self, url, user):
+        for alias in ('default', 'versions'):
+            caches[alias].clear()
+        self.client.force_authenticate(user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def get_all(self, urls, **settings) -> dict:
+        with override_settings(**settings):
+            return {
+                (url, user): self.get_json(url, user)
+                for url in urls
+                for user in (None, self.reader)
+            }
+
+    def test_fast_list_matches_serializer(self):
+        fast = self.get_all(self.LIST_URLS, FAST_LIST_SERIALIZATION=True)
+        Recipe.objects.update(document='')
+        expected = self.get_all(
+            self.LIST_URLS, FAST_LIST_SERIALIZATION=False
+        )
+
+        for key, data in expected.items():
+            with self.subTest(url=key[0], user=key[1]):
+                self.assertEqual(fast[key], data)
+
+    def test_fast_list_matches_detail(self):
+        params = ('', '?fields=id,name,is_favorited')
+        fast = self.get_all(
+            [f'/api/recipes/{query}' for query in params],
+            FAST_LIST_SERIALIZATION=True,
+        )
+        Recipe.objects.update(document='')
+
+        for query in params:
+            for user in (None, self.reader):
+                items = fast[f'/api/recipes/{query}', user]['results']
+                for item in items:
+                    with self.subTest(query=query, user=user, id=item['id']):
+                        self.assertEqual(
+                            item,
+                            self.get_json(
+                                f'/api/recipes/{item["id"]}/{query}', user
+                            ),
+                        )
+
+
+class NormalizeUnitTests(SimpleTestCase):
+    """Пересчет единиц измерения в базовые."""
+
+    def test_known_units(self):
+        self.assertEqual(normalize_unit('г'), ('г', 1))
+        self.assertEqual(normalize_unit('кг'), ('г', 1000))
+        self.assertEqual(normalize_unit('стакан'), ('мл', 250))
+
+    def test_aliases(self):
+        self.assertEqual(normalize_unit('гр.'), ('г', 1))
+        self.assertEqual(normalize_unit('литр'), ('мл', 1000))
+        self.assertEqual(normalize_unit('ст.л.'), ('мл', 15))
+        self.assertEqual(normalize_unit('штука'), ('шт.', 1))
+
+    def test_unknown_unit(self):
+        self.assertEqual(normalize_unit('щепотка'), ('щепотка', 1))
+
+    def test_shipped_ingredient_units(self):
+        path = settings.BASE_DIR.parent / 'data' / 'ingredients.csv'
+        with open(path, encoding='utf-8') as file:
+            units = {row[1] for row in csv.reader(file) if row}
+
+        known = get_unit_table().keys() | set(UNCONVERTED_UNITS)
+        self.assertEqual(units - known, set())
+        call_command('check_unit_table', str(path), stdout=StringIO())
+
+
+class ShoppingListUnitsTests(ApiTestCase):
+    """Сведение сумм списка покупок по единицам."""
+
+    def add(self, name, unit, amount):
+        ingredient, _ = Ingredient.objects.get_or_create(
+            name=name, measurement_unit=unit
+        )
+        ShoppingListItem.objects.create(
+            user=self.reader, ingredient=ingredient, amount=amount
+        )
+
+    def get_rows(self) -> list:
+        return list(to_display_units(aggregate_normalized_amounts(
+            ShoppingListItem.objects.filter(user=self.reader)
+        )))
+
+    def test_grams_and_kilograms_are_merged(self):
+        self.add('мука', 'г', 700)
+        self.add('мука', 'кг', 1)
+
+        rows = aggregate_normalized_amounts(ShoppingListItem.objects.all())
+        self.assertEqual(
+            [(row['base_unit'], row['base_amount'], row['unit_count'])
+             for row in rows],
+            [('г', 1700, 2)],
+        )
+        self.assertEqual(
+            self.get_rows(),
+            [{'name': 'мука', 'measurement_unit': 'кг', 'amount': 1.7}],
+        )
+
+    def test_small_amounts_stay_in_base_unit(self):
+        self.add('соль', 'г', 15)
+        self.add('молоко', 'л', 2)
+
+        self.assertEqual(self.get_rows(), [
+            {'name': 'молоко', 'measurement_unit': 'л', 'amount': 2},
+            {'name': 'соль', 'measurement_unit': 'г', 'amount': 15},
+        ])
+
+    def test_unknown_unit_is_kept(self):
+        self.add('перец', 'щепотка', 2)
+        self.add('перец', 'г', 5)
+
+        self.assertEqual(self.get_rows(), [
+            {'name': 'перец', 'measurement_unit': 'г', 'amount': 5},
+            {'name': 'перец', 'measurement_unit': 'щепотка', 'amount': 2},
+        ])
+
+    def test_mixed_units_of_one_ingredient(self):
+        self.add('сахар', 'ст. л.', 3)
+        self.add('молоко', 'стакан', 1)
+        self.add('молоко', 'мл', 200)
+
+        self.assertEqual(self.get_rows(), [
+            {'name': 'молоко', 'measurement_unit': 'мл', 'amount': 450},
+            {'name': 'сахар', 'measurement_unit': 'ст. л.', 'amount': 3},
+        ])
+
+    def test_download_txt(self):
+        self.add('мука', 'г', 700)
+        self.add('мука', 'кг', 1)
+        self.client.force_authenticate(self.reader)
+
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/', {'format': 'txt'}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'мука, 1.7кг', b''.join(response.streaming_content).decode()
+        )
@@ -0,0 +1,31 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+_explicit_models = ContextVar('explicit_models', default=frozenset())
+
+
+@contextmanager
+def explicit_bookkeeping(*models):
+    """
+    Отключить обработчики сигналов моделей, изменения которых
+    код внутри блока учитывает сам.
+
+    Массовые операции считают суммы списков покупок, кэш избранного
+    и корзины одним запросом на всю пачку. Обработчики сигналов
+    проверяют is_handled_explicitly и не повторяют эту работу
+    по одной строке.
+
+    Args:
+        *models (Model): Модели, сигналы которых обрабатываются явно.
+    """
+    token = _explicit_models.set(_explicit_models.get() | set(models))
+    try:
+        yield
+    finally:
+        _explicit_models.reset(token)
+
+
+def is_handled_explicitly(model) -> bool:
+    """Изменения модели учитываются вызывающим кодом."""
+    return model in _explicit_models.get()
@@ -0,0 +1,128 @@
+import hashlib
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.connection import ConnectionProxy
+
+
+VERSION_KEY = 'version:{}'
+# Версии хранятся в отдельном кэше, из которого они не вытесняются
+# вместе с ответами (см. CACHES в настройках).
+version_cache = ConnectionProxy(caches, 'versions')
+PAGINATION_PARAMS = ('page', 'limit', 'cursor')
+
+
+def get_versions(*names) -> list:
+    """
+    Получить версии таблиц из общего кэша.
+
+    Версия — время последнего изменения в наносекундах, поэтому ее
+    можно использовать и как ключ инвалидации, и как Last-Modified.
+    Отсутствующие в кэше версии инициализируются текущим временем.
+
+    Args:
+        *names (str): Имена версий, например 'recipe' или 'favorite:5'.
+
+    Returns:
+        list: Версии в том же порядке, что и имена.
+    """
+    keys = [VERSION_KEY.format(name) for name in names]
+    versions = version_cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            version_cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = version_cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(*names) -> None:
+    """
+    Обновить версии таблиц после фиксации текущей транзакции.
+
+    Args:
+        *names (str): Имена версий.
+    """
+    def bump():
+        now = time.time_ns()
+        version_cache.set_many(
+            {VERSION_KEY.format(name): now for name in names},
+            timeout=None,
+        )
+
+    transaction.on_commit(bump)
+
+
+def normalize_query_params(request, exclude=PAGINATION_PARAMS) -> str:
+    """
+    Привести параметры запроса к каноническому виду для ключа кэша.
+
+    Параметры и их значения сортируются, пустые значения отбрасываются.
+
+    Args:
+        request: Запрос.
+        exclude (tuple): Параметры, которые не влияют на результат.
+
+    Returns:
+        str: Нормализованная строка параметров.
+    """
+    params = request.query_params
+    return '&'.join(
+        f'{name}={value}'
+        for name in sorted(params)
+        if name not in exclude
+        for value in sorted(set(params.getlist(name)))
+        if value
+    )
+
+
+def get_view_versions(request, view) -> list:
+    """
+    Получить версии таблиц, от которых зависит ответ представления.
+
+    Общие версии перечисляются в атрибуте cache_versions представления,
+    версии, разделенные по пользователям, — в user_cache_versions.
+
+    Args:
+        request: Запрос.
+        view: Представление.
+
+    Returns:
+        list: Версии таблиц.
+    """
+    names = list(getattr(view, 'cache_versions', ()))
+    if request.user.is_authenticated:
+        names += [
+            f'{name}:{request.user.pk}'
+            for name in getattr(view, 'user_cache_versions', ())
+        ]
+    return get_versions(*names)
+
+
+def make_digest(*parts) -> str:
+    """
+    Получить хеш произвольных частей ключа.
+
+    Args:
+        *parts: Части ключа.
+
+    Returns:
+        str: Шестнадцатеричный MD5-хеш.
+    """
+    return hashlib.md5(
+        repr(parts).encode(), usedforsecurity=False
+    ).hexdigest()
+
+
+def make_cache_key(prefix, *parts) -> str:
+    """
+    Собрать короткий ключ кэша из произвольных частей.
+
+    Args:
+        prefix (str): Префикс ключа.
+        *parts: Части ключа.
+
+    Returns:
+        str: Ключ кэша.
+    """
+    return f'{prefix}:{make_digest(*parts)}'
@@ -0,0 +1,196 @@
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+
+from api.utils.cache_utils import bump_versions
+from baseapp.models import Recipe
+
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'recipe/variants'
+
+# Вариант картинки → наибольшая ширина и высота.
+IMAGE_VARIANTS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+
+# Расширение файла → формат Pillow. WebP — основной, JPEG — для
+# клиентов без его поддержки.
+IMAGE_FORMATS = {
+    'webp': 'WEBP',
+    'jpeg': 'JPEG',
+}
+
+_executor = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Получить пул потоков процесса, создав его при первом вызове."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_PIPELINE_WORKERS,
+            thread_name_prefix='recipe-images',
+        )
+    return _executor
+
+
+def wait_for_image_jobs() -> None:
+    """Дождаться завершения поставленных задач и остановить пул."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def needs_image_variants(recipe: Recipe) -> bool:
+    """Варианты построены не для текущей картинки рецепта."""
+    return recipe.image_variants.get('source', '') != recipe.image.name
+
+
+def render_image_variants(image) -> dict:
+    """
+    Построить уменьшенные копии картинки.
+
+    Картинка поворачивается по EXIF, прозрачность заливается белым,
+    метаданные (EXIF, ICC, комментарии) в копии не попадают.
+
+    Args:
+        image: Открытый файл картинки.
+
+    Returns:
+        dict: (вариант, расширение) → содержимое файла.
+    """
+    with Image.open(image) as source:
+        source = ImageOps.exif_transpose(source)
+        if source.mode in ('RGBA', 'LA', 'P'):
+            source = source.convert('RGBA')
+            background = Image.new('RGB', source.size, 'white')
+            background.paste(source, mask=source.getchannel('A'))
+            source = background
+        else:
+            source = source.convert('RGB')
+
+    rendered = {}
+    for variant, size in IMAGE_VARIANTS.items():
+        resized = source.copy()
+        resized.thumbnail(size, Image.LANCZOS)
+        resized.info = {}
+        for extension, image_format in IMAGE_FORMATS.items():
+            buffer = BytesIO()
+            resized.save(
+                buffer,
+                image_format,
+                quality=settings.IMAGE_VARIANT_QUALITY,
+                optimize=image_format == 'JPEG',
+            )
+            rendered[variant, extension] = buffer.getvalue()
+    return rendered
+
+
+def delete_image_variants(variants: dict) -> None:
+    """Удалить файлы вариантов из хранилища."""
+    for variant in IMAGE_VARIANTS:
+        for name in variants.get(variant, {}).values():
+            default_storage.delete(name)
+
+
+def build_image_variants(recipe_id: int) -> bool:
+    """
+    Построить и сохранить варианты картинки рецепта.
+
+    Результат записывается, только если картинка рецепта не сменилась,
+    пока строились варианты; иначе файлы удаляются, а варианты для новой
+    картинки построит следующая задача.
+
+    Args:
+        recipe_id (int): Идентификатор рецепта.
+
+    Returns:
+        bool: Записаны ли новые варианты.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        'image', 'image_variants'
+    ).first()
+    if recipe is None or not needs_image_variants(recipe):
+        return False
+
+    variants = {'source': recipe.image.name}
+    if recipe.image:
+        with recipe.image.open('rb') as image:
+            rendered = render_image_variants(image)
+        stem = posixpath.splitext(posixpath.basename(recipe.image.name))[0]
+        for (variant, extension), content in rendered.items():
+            variants.setdefault(variant, {})[extension] = (
+                default_storage.save(
+                    f'{VARIANTS_DIR}/{recipe_id}/{stem}_{variant}.'
+                    f'{extension}',
+                    ContentFile(content),
+                )
+            )
+
+    with transaction.atomic():
+        updated = Recipe.objects.filter(
+            pk=recipe_id, image=recipe.image.name
+        ).update(image_variants=variants)
+        if updated:
+            # update() не вызывает сигналы, версию рецептов обновляем сами.
+            bump_versions('recipe')
+    delete_image_variants(recipe.image_variants if updated else variants)
+    return bool(updated)
+
+
+def run_image_job(recipe_id: int, close_connections: bool = True) -> None:
+    """
+    Выполнить задачу, записав ошибку в лог.
+
+    Ошибка не выходит наружу: рецепт уже сохранен, а варианты можно
+    построить позже командой build_image_variants.
+
+    Args:
+        recipe_id (int): Идентификатор рецепта.
+        close_connections (bool): Закрыть соединения с базой после
+            задачи. Нужно в потоках пула, у каждого из которых свое
+            соединение; в потоке запроса соединением управляет Django.
+    """
+    try:
+        build_image_variants(recipe_id)
+    except Exception:
+        logger.exception('Не удалось обработать картинку рецепта %s',
+                         recipe_id)
+    finally:
+        if close_connections:
+            connections.close_all()
+
+
+def enqueue_image_variants(recipe_id: int) -> None:
+    """
+    Поставить построение вариантов в очередь после фиксации транзакции.
+
+    Режим задается настройкой IMAGE_PIPELINE: thread — пул потоков
+    процесса (внешний брокер не нужен), sync — сразу в текущем
+    потоке, off — варианты не строятся.
+
+    Args:
+        recipe_id (int): Идентификатор рецепта.
+    """
+    mode = settings.IMAGE_PIPELINE
+    if mode == 'thread':
+        transaction.on_commit(
+            lambda: get_executor().submit(run_image_job, recipe_id)
+        )
+    elif mode == 'sync':
+        transaction.on_commit(
+            lambda: run_image_job(recipe_id, close_connections=False)
+        )
@@ -0,0 +1,189 @@
+import heapq
+import re
+import sys
+import threading
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+
+from api.utils.cache_utils import get_versions
+from baseapp.models import Ingredient
+
+
+WORD_RE = re.compile(r'[^\W_]+')
+
+
+def get_trigrams(text: str) -> set:
+    """
+    Разбить строку на триграммы так же, как это делает pg_trgm.
+
+    Каждое слово в нижнем регистре дополняется двумя пробелами слева
+    и одним справа, поэтому начало слова весит больше, чем его конец.
+
+    Args:
+        text (str): Строка.
+
+    Returns:
+        set: Множество триграмм.
+    """
+    trigrams = set()
+    for word in WORD_RE.findall(text.lower()):
+        padded = f'  {word} '
+        trigrams.update(
+            padded[i:i + 3] for i in range(len(padded) - 2)
+        )
+    return trigrams
+
+
+class IngredientIndex:
+    """
+    Индекс названий ингредиентов в памяти процесса для автодополнения.
+
+    Вместо префиксного дерева используется отсортированный список
+    названий в нижнем регистре: все названия с заданным префиксом
+    лежат в нем подряд, и их границы находятся двоичным поиском.
+    Справочник небольшой и меняется редко, поэтому индекс строится
+    целиком при первом обращении и перестраивается, когда меняется
+    версия 'ingredient'.
+
+    Для нечеткого поиска рядом хранится обратный индекс триграмм:
+    для каждой триграммы — номера названий, в которых она встречается.
+    """
+
+    fields = ('id', 'name', 'measurement_unit')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._data = ([], [], {}, [])
+
+    def _build(self, version) -> None:
+        rows = sorted(
+            Ingredient.objects.values(*self.fields),
+            key=lambda row: (row['name'].lower(), row['id']),
+        )
+        postings = defaultdict(list)
+        sizes = []
+        for position, row in enumerate(rows):
+            trigrams = get_trigrams(row['name'])
+            sizes.append(len(trigrams))
+            for trigram in trigrams:
+                postings[trigram].append(position)
+        self._data = (
+            [row['name'].lower() for row in rows], rows, dict(postings), sizes
+        )
+        self._version = version
+
+    def _ensure_fresh(self) -> None:
+        version, = get_versions('ingredient')
+        if version == self._version:
+            return
+        with self._lock:
+            if version != self._version:
+                self._build(version)
+
+    def search(self, name: str, substring: bool = False) -> list:
+        """
+        Найти ингредиенты, название которых начинается с name.
+
+        Args:
+            name (str): Начало названия, регистр не учитывается.
+            substring (bool): Добавить после них ингредиенты, в названии
+                которых name встречается не в начале.
+
+        Returns:
+            list: Словари с полями id, name и measurement_unit.
+            Совпадения по началу названия идут в порядке id, как
+            в запросе istartswith, совпадения внутри названия — после
+            них, ближние к началу названия раньше.
+        """
+        self._ensure_fresh()
+        keys, rows, _, _ = self._data
+        prefix = name.lower()
+
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + chr(sys.maxunicode), start)
+        result = sorted(rows[start:end], key=lambda row: row['id'])
+
+        if substring:
+            matches = [
+                (position, row['id'], row)
+                for key, row in zip(keys, rows)
+                if (position := key.find(prefix)) > 0
+            ]
+            result.extend(row for _, _, row in sorted(matches))
+        return result
+
+    def search_similar(self, name: str, limit: int,
+                       threshold: float) -> list:
+        """
+        Найти ингредиенты с похожими названиями (с опечатками).
+
+        Сходство считается как в pg_trgm: число общих триграмм,
+        деленное на число триграмм в объединении. Общие триграммы
+        подсчитываются по обратному индексу, поэтому просматриваются
+        только названия, у которых есть хотя бы одна общая триграмма.
+
+        Args:
+            name (str): Искомое название.
+            limit (int): Максимальное количество результатов.
+            threshold (float): Минимальное сходство от 0 до 1.
+
+        Returns:
+            list: Словари с полями id, name и measurement_unit,
+            более похожие раньше.
+        """
+        self._ensure_fresh()
+        _, rows, postings, sizes = self._data
+        trigrams = get_trigrams(name)
+        shared = Counter()
+        for trigram in trigrams:
+            shared.update(postings.get(trigram, ()))
+
+        scored = []
+        for position, common in shared.items():
+            similarity = common / (len(trigrams) + sizes[position] - common)
+            if similarity >= threshold:
+                scored.append((similarity, -rows[position]['id'], position))
+        return [
+            rows[position]
+            for _, _, position in heapq.nlargest(limit, scored)
+        ]
+
+
+ingredient_index = IngredientIndex()
+
+
+def search_similar_ingredients(name: str) -> list:
+    """
+    Нечеткий поиск ингредиентов по названию.
+
+    По умолчанию используется индекс триграмм в памяти процесса.
+    Если INGREDIENT_FUZZY_BACKEND = 'pg_trgm' и база — PostgreSQL,
+    сходство считает расширение pg_trgm.
+
+    Args:
+        name (str): Искомое название.
+
+    Returns:
+        list: Словари с полями id, name и measurement_unit.
+    """
+    limit = settings.INGREDIENT_FUZZY_LIMIT
+    threshold = settings.INGREDIENT_FUZZY_THRESHOLD
+    if (
+        settings.INGREDIENT_FUZZY_BACKEND == 'pg_trgm'
+        and connection.vendor == 'postgresql'
+    ):
+        return list(
+            Ingredient.objects.annotate(
+                similarity=TrigramSimilarity('name', name)
+            ).filter(
+                similarity__gte=threshold
+            ).order_by('-similarity', 'id').values(
+                *IngredientIndex.fields
+            )[:limit]
+        )
+    return ingredient_index.search_similar(name, limit, threshold)
@@ -0,0 +1,148 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from api.utils.cache_utils import VERSION_KEY, get_versions, version_cache
+from baseapp.models import Favorite, ShoppingCart
+
+
+MEMBERSHIP_MODELS = {
+    'favorite': Favorite,
+    'shoppingcart': ShoppingCart,
+}
+MEMBERSHIP_KEY = 'membership:{}:{}'
+MEMBERSHIP_STATS_KEY = 'membership:stats:{}'
+
+
+MEMBERSHIP_STATS_EVENTS = ('hits', 'misses')
+
+
+def _count(event: str) -> None:
+    """
+    Увеличить счетчик попаданий или промахов кэша.
+
+    Счетчики включаются настройкой MEMBERSHIP_CACHE_STATS. В Redis
+    и memcached incr атомарен; в файловом кэше это чтение и запись,
+    поэтому при параллельных запросах часть событий теряется
+    и счетчики приблизительны.
+    """
+    if not settings.MEMBERSHIP_CACHE_STATS:
+        return
+    key = MEMBERSHIP_STATS_KEY.format(event)
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def get_membership_stats() -> dict:
+    """
+    Получить счетчики кэша избранного и списка покупок.
+
+    Returns:
+        dict: Количество попаданий и промахов кэша.
+    """
+    stats = cache.get_many(
+        [MEMBERSHIP_STATS_KEY.format(event)
+         for event in MEMBERSHIP_STATS_EVENTS]
+    )
+    return {
+        event: stats.get(MEMBERSHIP_STATS_KEY.format(event), 0)
+        for event in MEMBERSHIP_STATS_EVENTS
+    }
+
+
+def reset_membership_stats() -> None:
+    """Обнулить счетчики кэша избранного и списка покупок."""
+    cache.delete_many(
+        [MEMBERSHIP_STATS_KEY.format(event)
+         for event in MEMBERSHIP_STATS_EVENTS]
+    )
+
+
+def get_recipe_membership(request, kind: str) -> frozenset:
+    """
+    Получить идентификаторы рецептов в избранном или списке покупок
+    текущего пользователя.
+
+    Множество загружается не больше одного раза за запрос и хранится
+    в общем кэше вместе с версией 'favorite:<id>' или
+    'shoppingcart:<id>'. Если версия изменилась, множество
+    загружается из базы заново.
+
+    Args:
+        request: Запрос.
+        kind (str): 'favorite' или 'shoppingcart'.
+
+    Returns:
+        frozenset: Идентификаторы рецептов.
+    """
+    user = request.user
+    if user.is_anonymous:
+        return frozenset()
+
+    memo = request.__dict__.setdefault('_recipe_membership', {})
+    if kind in memo:
+        return memo[kind]
+
+    version, = get_versions(f'{kind}:{user.pk}')
+    key = MEMBERSHIP_KEY.format(kind, user.pk)
+    cached = cache.get(key)
+    if cached is not None and cached[0] == version:
+        _count('hits')
+        recipe_ids = cached[1]
+    else:
+        _count('misses')
+        recipe_ids = frozenset(
+            MEMBERSHIP_MODELS[kind].objects.filter(
+                user_id=user.pk
+            ).values_list('recipe_id', flat=True)
+        )
+        cache.set(
+            key, (version, recipe_ids),
+            timeout=settings.MEMBERSHIP_CACHE_TIMEOUT,
+        )
+
+    memo[kind] = recipe_ids
+    return recipe_ids
+
+
+def update_recipe_membership(kind: str, user_id: int,
+                             added=(), removed=()) -> None:
+    """
+    Обновить кэш избранного или списка покупок без запроса к базе.
+
+    Изменение применяется после фиксации транзакции. Версия
+    пользователя обновляется вместе с множеством, поэтому множество,
+    загруженное параллельным запросом до изменения, не будет принято
+    за актуальное. Если кэш уже не совпадает с версией, он удаляется.
+
+    Args:
+        kind (str): 'favorite' или 'shoppingcart'.
+        user_id (int): Идентификатор пользователя.
+        added (iterable): Добавленные рецепты.
+        removed (iterable): Удаленные рецепты.
+    """
+    version_key = VERSION_KEY.format(f'{kind}:{user_id}')
+    key = MEMBERSHIP_KEY.format(kind, user_id)
+    added, removed = frozenset(added), frozenset(removed)
+
+    def update():
+        cached = cache.get(key)
+        previous = version_cache.get(version_key)
+        version = time.time_ns()
+        version_cache.set(version_key, version, timeout=None)
+        if cached is None or cached[0] != previous:
+            # Множество уже устарело или его меняют параллельно:
+            # проще перечитать его из базы при следующем запросе.
+            cache.delete(key)
+            return
+        cache.set(
+            key, (version, (cached[1] - removed) | added),
+            timeout=settings.MEMBERSHIP_CACHE_TIMEOUT,
+        )
+
+    transaction.on_commit(update)
@@ -0,0 +1,175 @@
+import heapq
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from api.utils.cache_utils import get_versions
+from baseapp.models import RecipeIngredients
+
+
+class RecipeIngredientIndex:
+    """
+    Обратный индекс «ингредиент → рецепты» в памяти процесса для поиска
+    рецептов по имеющимся продуктам.
+
+    Для каждого рецепта хранится отсортированный кортеж идентификаторов
+    его ингредиентов, для каждого ингредиента — список рецептов.
+    Изменения рецептов, сохраненных в этом процессе, применяются
+    к индексу сразу. Изменения из других процессов видны по версии
+    'recipeingredients': индекс перестраивается целиком, но не чаще
+    раза в RECIPE_INGREDIENT_INDEX_MAX_AGE секунд. Удаленные за это
+    время рецепты отсекает сам запрос к базе.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._built_at = None
+        self._recipes = {}
+        self._postings = {}
+
+    def build(self, rows) -> None:
+        """
+        Построить индекс по парам (рецепт, ингредиент).
+
+        Args:
+            rows (iterable): Пары идентификаторов, отсортированные
+                по рецепту.
+        """
+        recipes = defaultdict(list)
+        postings = defaultdict(list)
+        for recipe_id, ingredient_id in rows:
+            recipes[recipe_id].append(ingredient_id)
+            postings[ingredient_id].append(recipe_id)
+        self._recipes = {
+            recipe_id: tuple(sorted(ingredient_ids))
+            for recipe_id, ingredient_ids in recipes.items()
+        }
+        self._postings = dict(postings)
+        self._built_at = time.monotonic()
+
+    def _ensure_fresh(self) -> None:
+        version, = get_versions('recipeingredients')
+        if version == self._version or (
+            self._built_at is not None
+            and time.monotonic() - self._built_at
+            < settings.RECIPE_INGREDIENT_INDEX_MAX_AGE
+        ):
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            self.build(
+                RecipeIngredients.objects.order_by(
+                    'recipe_id'
+                ).values_list(
+                    'recipe_id', 'ingredient_id'
+                ).iterator(chunk_size=10000)
+            )
+            self._version = version
+
+    def update_recipe(self, recipe_id: int, ingredient_ids=()) -> None:
+        """
+        Заменить ингредиенты рецепта в индексе.
+
+        Args:
+            recipe_id (int): Идентификатор рецепта.
+            ingredient_ids (iterable): Новые ингредиенты; пустой список
+                удаляет рецепт из индекса.
+        """
+        with self._lock:
+            old = self._recipes.pop(recipe_id, ())
+            for ingredient_id in old:
+                self._postings[ingredient_id].remove(recipe_id)
+            new = tuple(sorted(set(ingredient_ids)))
+            if new:
+                self._recipes[recipe_id] = new
+            for ingredient_id in new:
+                self._postings.setdefault(ingredient_id, []).append(
+                    recipe_id
+                )
+
+    def rank(self, have, exclude=(), min_coverage: float = 0,
+             limit: int = None) -> list:
+        """
+        Найти рецепты, ингредиенты которых покрыты набором have.
+
+        Args:
+            have (iterable): Имеющиеся ингредиенты.
+            exclude (iterable): Ингредиенты, которых не должно быть
+                в рецепте.
+            min_coverage (float): Минимальная доля ингредиентов рецепта,
+                которые есть в have.
+            limit (int): Максимальное количество рецептов.
+
+        Returns:
+            list: Идентификаторы рецептов, начиная с наибольшего
+            покрытия; при равном покрытии — с меньшим числом
+            недостающих ингредиентов, затем более новые.
+        """
+        recipes, postings = self._recipes, self._postings
+        matched = Counter()
+        for ingredient_id in set(have):
+            matched.update(postings.get(ingredient_id, ()))
+
+        excluded = set()
+        for ingredient_id in set(exclude):
+            excluded.update(postings.get(ingredient_id, ()))
+
+        scored = []
+        for recipe_id, count in matched.items():
+            total = len(recipes.get(recipe_id, ()))
+            if (
+                not total or recipe_id in excluded
+                or count < min_coverage * total
+            ):
+                continue
+            scored.append((count / total, count - total, recipe_id))
+
+        if limit is None:
+            scored.sort(reverse=True)
+        else:
+            scored = heapq.nlargest(limit, scored)
+        return [recipe_id for _, _, recipe_id in scored]
+
+    def search(self, have, exclude=()) -> list:
+        """
+        Поиск по актуальному индексу с настройками проекта.
+
+        Args:
+            have (iterable): Имеющиеся ингредиенты.
+            exclude (iterable): Исключаемые ингредиенты.
+
+        Returns:
+            list: Идентификаторы рецептов по убыванию покрытия.
+        """
+        self._ensure_fresh()
+        return self.rank(
+            have,
+            exclude,
+            min_coverage=settings.RECIPE_HAVE_MIN_COVERAGE,
+            limit=settings.RECIPE_HAVE_CANDIDATE_LIMIT,
+        )
+
+
+recipe_ingredient_index = RecipeIngredientIndex()
+
+
+def update_recipe_ingredient_index(recipe_id: int,
+                                   ingredient_ids=()) -> None:
+    """
+    Обновить индекс этого процесса после фиксации транзакции.
+
+    Args:
+        recipe_id (int): Идентификатор рецепта.
+        ingredient_ids (iterable): Ингредиенты рецепта.
+    """
+    ingredient_ids = tuple(ingredient_ids)
+    transaction.on_commit(
+        lambda: recipe_ingredient_index.update_recipe(
+            recipe_id, ingredient_ids
+        )
+    )
@@ -0,0 +1,81 @@
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+)
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Q, Value, When
+
+from baseapp.models import Recipe
+
+
+SEARCH_CONFIG = 'russian'
+
+
+def get_recipe_search_vector():
+    """
+    Получить выражение поискового вектора рецепта.
+
+    Название весит больше описания (веса A и B).
+
+    Returns:
+        CombinedSearchVector: Выражение для update() или annotate().
+    """
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+    )
+
+
+def is_full_text_search_supported() -> bool:
+    """Поисковый вектор хранится только в PostgreSQL."""
+    return connection.vendor == 'postgresql'
+
+
+def update_recipe_search_vectors(recipes) -> int:
+    """
+    Пересчитать поисковые векторы рецептов одним UPDATE.
+
+    Args:
+        recipes (QuerySet): Рецепты.
+
+    Returns:
+        int: Количество обновленных рецептов.
+    """
+    if not is_full_text_search_supported():
+        return 0
+    return recipes.update(search_vector=get_recipe_search_vector())
+
+
+def search_recipes(queryset, value: str):
+    """
+    Отфильтровать рецепты по тексту и упорядочить по релевантности.
+
+    На PostgreSQL используется сохраненный tsvector с русским
+    стеммингом, на остальных базах — поиск подстроки в названии
+    и описании, где совпадения в названии идут первыми.
+
+    Args:
+        queryset (QuerySet): Рецепты.
+        value (str): Поисковый запрос.
+
+    Returns:
+        QuerySet: Найденные рецепты, более релевантные раньше.
+    """
+    if is_full_text_search_supported():
+        query = SearchQuery(
+            value, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', *Recipe._meta.ordering)
+
+    return queryset.filter(
+        Q(name__icontains=value) | Q(text__icontains=value)
+    ).alias(
+        search_rank=Case(
+            When(name__icontains=value, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    ).order_by('-search_rank', *Recipe._meta.ordering)
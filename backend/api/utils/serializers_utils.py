@@ -1,43 +1,192 @@
+import json
+
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+from django.core.files.storage import default_storage
+from django.db.models import (
+    Exists,
+    OuterRef,
+    Prefetch,
+    prefetch_related_objects,
+)
+
+from api.config.config import (
+    AT_LEAST_ONE_TAG,
+    IDENTICAL_ONES_ARE_NOT_ALLOWED,
+    INGREDIENTS_DO_NOT_EXIST,
+    INVALID_INGREDIENTS_JSON,
+)
+from api.utils.membership import get_recipe_membership
+from baseapp.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredients,
+    ShoppingCart,
+)
+from users.models import Subscription
 
-from api.config.config import AT_LEAST_ONE_TAG, IDENTICAL_ONES_ARE_NOT_ALLOWED
-from baseapp.models import Favorite, ShoppingCart
 
+RECIPE_USER_FLAGS = {
+    'favorited_by_user': 'is_favorited',
+    'in_user_shopping_cart': 'is_in_shopping_cart',
+    'author_subscribed_by_user': 'author',
+}
+# Флаги, которые берутся из кэша избранного и корзины пользователя,
+# а не из подзапросов EXISTS.
+RECIPE_MEMBERSHIP_FLAGS = {
+    'favorited_by_user': 'favorite',
+    'in_user_shopping_cart': 'shoppingcart',
+}
 
-def is_recipe_favorited(user, recipe):
+
+def annotate_recipe_user_flags(queryset, user, flags=tuple(RECIPE_USER_FLAGS)):
     """
-    Проверить, добавлен ли рецепт в избранное пользователем.
+    Аннотировать queryset рецептов флагами избранного, списка покупок
+    и подписки на автора.
+
+    Флаги вычисляются подзапросами EXISTS в том же SQL-запросе,
+    что и сами рецепты, поэтому сериализатору не нужно обращаться
+    к базе для каждой строки.
 
     Args:
-        user (User): Пользователь.
-        recipe (Recipe): Рецепт.
+        queryset (QuerySet): Queryset рецептов.
+        user (User): Текущий пользователь.
+        flags (tuple): Имена флагов из RECIPE_USER_FLAGS.
 
     Returns:
-        bool: True, если рецепт добавлен в избранное пользователем,
-        иначе False.
+        QuerySet: Аннотированный queryset.
     """
-    if user.is_anonymous:
-        return False
+    if user.is_anonymous or not flags:
+        return queryset
 
-    return Favorite.objects.filter(user=user, recipe=recipe).exists()
+    expressions = {
+        'favorited_by_user': Exists(
+            Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+        ),
+        'in_user_shopping_cart': Exists(
+            ShoppingCart.objects.filter(user=user, recipe=OuterRef('pk'))
+        ),
+        'author_subscribed_by_user': Exists(
+            Subscription.objects.filter(user=user, author=OuterRef('author'))
+        ),
+    }
+    return queryset.annotate(**{flag: expressions[flag] for flag in flags})
 
 
-def is_recipe_in_shopping_cart(user, recipe):
+def get_recipe_user_flag(recipe, flag, request):
     """
-    Проверить, добавлен ли рецепт в список покупок пользователя.
+    Получить флаг рецепта для текущего пользователя.
+
+    Если рецепт пришел из аннотированного queryset, значение берется
+    из аннотации. Избранное и корзина проверяются по кэшу пользователя
+    (см. get_recipe_membership), остальные флаги загружаются одним
+    запросом и запоминаются в объекте рецепта.
 
     Args:
-        user (User): Пользователь.
         recipe (Recipe): Рецепт.
+        flag (str): Имя флага из RECIPE_USER_FLAGS.
+        request: Запрос.
 
     Returns:
-        bool: True, если рецепт добавлен в список покупок пользователя,
-        иначе False.
+        bool: Значение флага.
     """
-    if user.is_anonymous:
+    if request is None or request.user.is_anonymous:
         return False
 
-    return ShoppingCart.objects.filter(user=user, recipe=recipe).exists()
+    if hasattr(recipe, flag):
+        return bool(getattr(recipe, flag))
+
+    if flag in RECIPE_MEMBERSHIP_FLAGS:
+        return recipe.pk in get_recipe_membership(
+            request, RECIPE_MEMBERSHIP_FLAGS[flag]
+        )
+
+    names = tuple(
+        name for name in RECIPE_USER_FLAGS
+        if name not in RECIPE_MEMBERSHIP_FLAGS
+    )
+    flags = annotate_recipe_user_flags(
+        Recipe.objects.filter(pk=recipe.pk), request.user, names
+    ).values(*names).first() or {}
+    for name in names:
+        setattr(recipe, name, flags.get(name, False))
+
+    return bool(getattr(recipe, flag))
+
+
+def get_sparse_fieldset(request):
+    """
+    Получить поля, запрошенные параметрами ?fields= и ?omit=.
+
+    Параметры учитываются только для безопасных (читающих) запросов.
+
+    Args:
+        request: Запрос.
+
+    Returns:
+        tuple: Множество запрошенных полей (None, если ограничения нет)
+        и множество исключенных полей.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None, set()
+
+    def parse(param):
+        value = request.query_params.get(param)
+        if not value:
+            return None
+        return {name.strip() for name in value.split(',') if name.strip()}
+
+    return parse('fields'), parse('omit') or set()
+
+
+def is_field_requested(request, name):
+    """
+    Проверить, нужно ли выводить поле в ответе.
+
+    Args:
+        request: Запрос.
+        name (str): Имя поля сериализатора.
+
+    Returns:
+        bool: True, если поле запрошено и не исключено.
+    """
+    fields, omit = get_sparse_fieldset(request)
+    return name not in omit and (fields is None or name in fields)
+
+
+def get_recipe_ingredients_prefetch():
+    """
+    Получить Prefetch для ингредиентов рецепта вместе с их названиями
+    и единицами измерения.
+
+    Returns:
+        Prefetch: Объект предзагрузки для recipeingredients_set.
+    """
+    return Prefetch(
+        'recipeingredients_set',
+        queryset=RecipeIngredients.objects.select_related('ingredient'),
+    )
+
+
+def prefetch_recipe_ingredients(recipes):
+    """
+    Предзагрузить ингредиенты для рецептов, у которых их еще нет в кэше.
+
+    Все рецепты без кэша загружаются одним запросом.
+
+    Args:
+        recipes (list): Список рецептов.
+    """
+    missing = [
+        recipe for recipe in recipes
+        if 'recipeingredients_set' not in getattr(
+            recipe, '_prefetched_objects_cache', {}
+        )
+    ]
+    if missing:
+        prefetch_related_objects(missing, get_recipe_ingredients_prefetch())
 
 
 def validate_tags(tags):
@@ -72,3 +221,82 @@ def validate_unique_ingredients(ingredients):
             raise serializers.ValidationError(IDENTICAL_ONES_ARE_NOT_ALLOWED)
         ingredient_ids.add(ingredient_id)
     return ingredients
+
+
+def validate_ingredients_exist(ingredients):
+    """
+    Проверить одним запросом, что все ингредиенты есть в справочнике.
+
+    Args:
+        ingredients (list): Список ингредиентов.
+
+    Raises:
+        serializers.ValidationError: Если каких-то ингредиентов нет.
+    """
+    ingredient_ids = {item['id'] for item in ingredients}
+    missing = ingredient_ids - set(
+        Ingredient.objects.filter(
+            pk__in=ingredient_ids
+        ).values_list('pk', flat=True)
+    )
+    if missing:
+        raise serializers.ValidationError(
+            INGREDIENTS_DO_NOT_EXIST.format(
+                ', '.join(map(str, sorted(missing)))
+            )
+        )
+    return ingredients
+
+
+def get_image_variant_urls(variants: dict, request=None) -> dict:
+    """
+    Получить адреса вариантов картинки рецепта.
+
+    Args:
+        variants (dict): Поле image_variants рецепта.
+        request: Запрос для построения абсолютных адресов.
+
+    Returns:
+        dict: Вариант → {расширение: адрес}. Пустой словарь, пока
+        варианты не построены.
+    """
+    urls = {}
+    for variant, files in variants.items():
+        if variant == 'source':
+            continue
+        urls[variant] = {}
+        for extension, name in files.items():
+            url = default_storage.url(name)
+            urls[variant][extension] = (
+                request.build_absolute_uri(url) if request else url
+            )
+    return urls
+
+
+def parse_multipart_recipe(data) -> dict:
+    """
+    Привести рецепт из multipart/form-data к виду JSON-запроса.
+
+    Теги передаются повторяющимся полем tags, ингредиенты — JSON-списком
+    в поле ingredients, картинка — файлом в поле image.
+
+    Args:
+        data (QueryDict): Данные запроса.
+
+    Returns:
+        dict: Данные для сериализатора.
+
+    Raises:
+        serializers.ValidationError: Если ингредиенты не JSON-список.
+    """
+    result = data.dict()
+    if 'tags' in data:
+        result['tags'] = data.getlist('tags')
+    if 'ingredients' in data:
+        try:
+            result['ingredients'] = json.loads(data['ingredients'])
+        except ValueError:
+            raise serializers.ValidationError(
+                {'ingredients': [INVALID_INGREDIENTS_JSON]}
+            )
+    return result
@@ -0,0 +1,115 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+from baseapp.models import RecipeIngredients, ShoppingCart, ShoppingListItem
+
+
+def get_recipes_amounts(recipe_ids) -> Counter:
+    """
+    Сложить количества ингредиентов нескольких рецептов.
+
+    Args:
+        recipe_ids (iterable): Идентификаторы рецептов.
+
+    Returns:
+        Counter: Идентификатор ингредиента → сумма количеств.
+    """
+    return Counter(dict(
+        RecipeIngredients.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values('ingredient_id').annotate(
+            total=Sum('amount')
+        ).values_list('ingredient_id', 'total')
+    ))
+
+
+def update_shopping_lists(user_ids, deltas: dict) -> None:
+    """
+    Изменить суммы ингредиентов в списках покупок пользователей.
+
+    Изменение выполняется тремя запросами независимо от числа
+    пользователей и ингредиентов: недостающие строки создаются
+    с нулем, суммы сдвигаются одним UPDATE, обнулившиеся строки
+    удаляются. Сдвиг через F() не теряет параллельные изменения.
+
+    Args:
+        user_ids (iterable): Пользователи, у которых изменился список.
+        deltas (dict): Идентификатор ингредиента → изменение количества.
+    """
+    user_ids = list(user_ids)
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items() if delta
+    }
+    if not user_ids or not deltas:
+        return
+
+    with transaction.atomic():
+        ShoppingListItem.objects.bulk_create(
+            [
+                ShoppingListItem(
+                    user_id=user_id, ingredient_id=ingredient_id, amount=0
+                )
+                for user_id in user_ids
+                for ingredient_id, delta in deltas.items() if delta > 0
+            ],
+            ignore_conflicts=True,
+        )
+        items = ShoppingListItem.objects.filter(
+            user_id__in=user_ids, ingredient_id__in=deltas
+        )
+        items.update(
+            amount=F('amount') + Case(
+                *(
+                    When(ingredient_id=ingredient_id, then=Value(delta))
+                    for ingredient_id, delta in deltas.items()
+                ),
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        )
+        items.filter(amount__lte=0).delete()
+
+
+def change_shopping_list(user_id: int, recipe_ids, sign: int = 1) -> None:
+    """
+    Учесть рецепты, добавленные в корзину (sign=1) или убранные
+    из нее (sign=-1).
+
+    Args:
+        user_id (int): Пользователь.
+        recipe_ids (iterable): Рецепты.
+        sign (int): 1 или -1.
+    """
+    amounts = get_recipes_amounts(recipe_ids)
+    update_shopping_lists(
+        (user_id,),
+        {
+            ingredient_id: sign * amount
+            for ingredient_id, amount in amounts.items()
+        },
+    )
+
+
+def propagate_recipe_amounts(recipe_id: int, old: dict, new: dict) -> None:
+    """
+    Перенести изменение ингредиентов рецепта в списки покупок всех
+    пользователей, у которых рецепт в корзине.
+
+    Args:
+        recipe_id (int): Рецепт.
+        old (dict): Ингредиент → количество до изменения.
+        new (dict): Ингредиент → количество после изменения.
+    """
+    deltas = Counter(new)
+    deltas.subtract(old)
+    if not any(deltas.values()):
+        return
+    update_shopping_lists(
+        ShoppingCart.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('user_id', flat=True),
+        deltas,
+    )
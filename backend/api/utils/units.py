@@ -0,0 +1,180 @@
+from django.db.models import Case, CharField, Count, F, Min, Sum, Value, When
+
+
+UNIT_FIELD = 'ingredient__measurement_unit'
+
+# Единица из справочника → (базовая единица, множитель).
+UNIT_CONVERSIONS = {
+    'г': ('г', 1),
+    'кг': ('г', 1000),
+    'мл': ('мл', 1),
+    'л': ('мл', 1000),
+    'ч. л.': ('мл', 5),
+    'ст. л.': ('мл', 15),
+    'стакан': ('мл', 250),
+}
+
+# Другие написания тех же единиц, которые встречаются при ручном вводе.
+UNIT_ALIASES = {
+    'гр': 'г',
+    'гр.': 'г',
+    'грамм': 'г',
+    'кг.': 'кг',
+    'килограмм': 'кг',
+    'мл.': 'мл',
+    'миллилитр': 'мл',
+    'литр': 'л',
+    'л.': 'л',
+    'ч.л.': 'ч. л.',
+    'чайная ложка': 'ч. л.',
+    'ст.л.': 'ст. л.',
+    'столовая ложка': 'ст. л.',
+    'шт': 'шт.',
+    'штука': 'шт.',
+    'пачка': 'упаковка',
+}
+
+# Остальные единицы справочника (data/ingredients.csv): штучные
+# и неточные меры, пересчитывать их не во что, суммы выводятся в них.
+UNCONVERTED_UNITS = (
+    'шт.', 'по вкусу', 'горсть', 'щепотка', 'упаковка', 'банка', 'кусок',
+    'пакет', 'пакетик', 'капля', 'пучок', 'веточка', 'стручок', 'стебель',
+    'лист', 'зубчик', 'долька', 'звездочка', 'тушка', 'пласт', 'батон',
+    'бутылка',
+)
+
+# Единицы, в которых показывается сумма, от большей к меньшей.
+DISPLAY_UNITS = {
+    'г': (('кг', 1000), ('г', 1)),
+    'мл': (('л', 1000), ('мл', 1)),
+}
+
+# Бытовые меры оставляются как есть, если у ингредиента в списке
+# нет других единиц того же рода: «3 ст. л.» понятнее, чем «45 мл».
+HOUSEHOLD_UNITS = ('ч. л.', 'ст. л.', 'стакан')
+
+
+def get_unit_table() -> dict:
+    """
+    Получить таблицу пересчета для всех известных написаний единиц.
+
+    Returns:
+        dict: Написание единицы → (базовая единица, множитель).
+        Единицы, которые не пересчитываются, отображаются сами в себя
+        с множителем 1.
+    """
+    table = dict(UNIT_CONVERSIONS)
+    for alias, unit in UNIT_ALIASES.items():
+        table[alias] = UNIT_CONVERSIONS.get(unit, (unit, 1))
+    return table
+
+
+def normalize_unit(unit: str) -> tuple:
+    """
+    Пересчитать единицу в базовую.
+
+    Args:
+        unit (str): Единица измерения из справочника.
+
+    Returns:
+        tuple: Базовая единица и множитель.
+    """
+    return get_unit_table().get(unit, (unit, 1))
+
+
+def aggregate_normalized_amounts(queryset):
+    """
+    Сложить количества ингредиентов с приведением единиц в SQL.
+
+    Строки группируются по названию ингредиента и базовой единице,
+    так что «мука, г» и «мука, кг» складываются в одну строку.
+    Таблица пересчета превращается в выражения CASE (только для
+    единиц, которые действительно меняются), поэтому пересчет
+    и суммирование делает один запрос.
+
+    Подходит любой queryset с полями ingredient и amount; список
+    покупок передает позиции ShoppingListItem пользователя, где
+    amount — уже сумма по всем рецептам корзины.
+
+    Args:
+        queryset (QuerySet): Позиции ShoppingListItem.
+
+    Returns:
+        QuerySet: Словари с ключами name (ingredient.name), base_unit,
+        base_amount (сумма amount в базовой единице), amount (сумма
+        без пересчета), unit_count (число разных
+        ingredient.measurement_unit) и first_unit, отсортированные
+        по названию.
+    """
+    table = get_unit_table()
+    base_unit = Case(
+        *(
+            When(**{UNIT_FIELD: unit}, then=Value(base))
+            for unit, (base, _) in table.items() if base != unit
+        ),
+        default=F(UNIT_FIELD),
+        output_field=CharField(),
+    )
+    factor = Case(
+        *(
+            When(**{UNIT_FIELD: unit}, then=Value(factor))
+            for unit, (_, factor) in table.items() if factor != 1
+        ),
+        default=Value(1),
+    )
+    return queryset.annotate(
+        name=F('ingredient__name'),
+        base_unit=base_unit,
+    ).values(
+        'name', 'base_unit'
+    ).annotate(
+        base_amount=Sum(F('amount') * factor),
+        amount=Sum('amount'),
+        unit_count=Count(UNIT_FIELD, distinct=True),
+        first_unit=Min(UNIT_FIELD),
+    ).order_by('name', 'base_unit')
+
+
+def to_display_units(rows):
+    """
+    Перевести суммы в единицы для показа за один проход.
+
+    Сумма выводится в наибольшей подходящей единице (1500 г → 1.5 кг).
+    Если у ингредиента была только одна бытовая мера, она остается.
+
+    Args:
+        rows (iterable): Строки aggregate_normalized_amounts().
+
+    Yields:
+        dict: Словари с ключами name, measurement_unit и amount.
+    """
+    for row in rows:
+        unit, amount = row['base_unit'], row['base_amount']
+        first_unit = UNIT_ALIASES.get(row['first_unit'], row['first_unit'])
+        if row['unit_count'] == 1 and first_unit in HOUSEHOLD_UNITS:
+            unit, amount = first_unit, row['amount']
+        else:
+            for display_unit, size in DISPLAY_UNITS.get(unit, ()):
+                if amount >= size:
+                    unit, amount = display_unit, amount / size
+                    break
+        yield {
+            'name': row['name'],
+            'measurement_unit': unit,
+            'amount': format_amount(amount),
+        }
+
+
+def format_amount(amount: float):
+    """
+    Привести количество к виду для списка покупок.
+
+    Args:
+        amount (int | float): Количество.
+
+    Returns:
+        int | float: Целое число, если дробной части нет,
+        иначе число с точностью до сотых.
+    """
+    rounded = round(amount, 2)
+    return int(rounded) if rounded == int(rounded) else rounded
@@ -0,0 +1,63 @@
+from PIL import Image
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+from api.config.config import IMAGE_DIMENSIONS_TOO_LARGE, IMAGE_TOO_LARGE
+
+
+def get_image_max_size_mb() -> str:
+    return f'{settings.RECIPE_IMAGE_MAX_SIZE / (1024 * 1024):.3g}'
+
+
+class ImageTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_code = 'image_too_large'
+
+    def __init__(self):
+        super().__init__(IMAGE_TOO_LARGE.format(get_image_max_size_mb()))
+
+
+class RecipeImageUploadHandler(TemporaryFileUploadHandler):
+    """
+    Обработчик загрузки, который пишет файл во временный файл на диске
+    по мере получения и обрывает загрузку, как только файл превысил
+    RECIPE_IMAGE_MAX_SIZE.
+    """
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.RECIPE_IMAGE_MAX_SIZE:
+            self.upload_interrupted()
+            raise ImageTooLarge
+        return super().receive_data_chunk(raw_data, start)
+
+
+def validate_image_dimensions(image) -> None:
+    """
+    Проверить ширину и высоту картинки по ее заголовку.
+
+    Image.open читает только заголовок, пиксели не распаковываются.
+
+    Args:
+        image: Файл картинки.
+
+    Raises:
+        serializers.ValidationError: Если картинка слишком большая.
+    """
+    limit = settings.RECIPE_IMAGE_MAX_DIMENSION
+    try:
+        with Image.open(image) as opened:
+            width, height = opened.size
+    except Image.DecompressionBombError:
+        width = height = limit + 1
+    except OSError:
+        # Битый файл отклонит проверка формата.
+        return
+    finally:
+        image.seek(0)
+    if max(width, height) > limit:
+        raise serializers.ValidationError(
+            IMAGE_DIMENSIONS_TOO_LARGE.format(limit)
+        )
@@ -3,14 +3,26 @@ from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework.serializers import Serializer
 
+from django.db import transaction
 from django.db.models import Model
 
 from api.config.config import ALREADY_SIGNED
 from api.serializers import UserSerializer
-from baseapp.models import Recipe
+from api.utils.bookkeeping import explicit_bookkeeping
+from api.utils.membership import update_recipe_membership
+from api.utils.shopping_list import change_shopping_list
+from baseapp.models import Recipe, ShoppingCart
 from users.models import Subscription, User
 
 
+# Результаты массового добавления и удаления рецептов.
+BULK_ADDED = 'added'
+BULK_ALREADY_LINKED = 'already_linked'
+BULK_REMOVED = 'removed'
+BULK_NOT_LINKED = 'not_linked'
+BULK_NOT_FOUND = 'not_found'
+
+
 def get_author(id: int) -> User:
     """
     Получить автора по его идентификатору.
@@ -24,6 +36,24 @@ def get_author(id: int) -> User:
     return get_object_or_404(User, id=id)
 
 
+def lock_user_links(user: User) -> None:
+    """
+    Заблокировать строку пользователя до конца транзакции.
+
+    Изменения избранного и корзины одного пользователя выполняются
+    по очереди: иначе два параллельных запроса увидят одни и те же
+    недостающие связи, а список покупок и кэш корзины будут изменены
+    дважды, хотя строка вставится одна. Блокировка строк самих связей
+    не помогает — вставляемых строк еще нет.
+
+    Args:
+        user (User): Пользователь.
+    """
+    User.objects.select_for_update().values_list('pk', flat=True).get(
+        pk=user.pk
+    )
+
+
 def perform_favorite_or_cart_action(
     user: User,
     recipe: Recipe,
@@ -47,20 +77,24 @@ def perform_favorite_or_cart_action(
         Response: Ответ на действие.
     """
     if request.method == 'POST':
-        existing_objects = model.objects.filter(user=user, recipe=recipe)
-        if existing_objects.exists():
-            raise exceptions.ValidationError(error_message)
-
-        model.objects.create(user=user, recipe=recipe)
+        # Вместе с корзиной в той же транзакции меняется список покупок
+        # (см. обработчики ShoppingCart в api.signals).
+        with transaction.atomic():
+            lock_user_links(user)
+            if model.objects.filter(user=user, recipe=recipe).exists():
+                raise exceptions.ValidationError(error_message)
+            model.objects.create(user=user, recipe=recipe)
         serializer = serializer_class(recipe, context={'request': request})
 
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     if request.method == 'DELETE':
-        deleted_count, _ = model.objects.filter(
-            user=user,
-            recipe=recipe
-        ).delete()
+        with transaction.atomic():
+            lock_user_links(user)
+            deleted_count, _ = model.objects.filter(
+                user=user,
+                recipe=recipe
+            ).delete()
 
         if deleted_count == 0:
             raise exceptions.ValidationError(error_message)
@@ -70,6 +104,84 @@ def perform_favorite_or_cart_action(
     return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
 
+def perform_bulk_favorite_or_cart_action(
+    user: User,
+    recipe_ids: list,
+    model: type[Model],
+    request
+) -> Response:
+    """
+    Добавить в избранное или список покупок (или убрать оттуда)
+    сразу несколько рецептов.
+
+    Изменение выполняется в одной транзакции одним bulk_create или
+    одним DELETE. Кэш избранного и корзины и список покупок
+    обновляются здесь явно для всей пачки: bulk_create не вызывает
+    сигналы, а обработчики удаления отключены explicit_bookkeeping.
+    Параллельные запросы пользователя выполняются по очереди
+    (lock_user_links), поэтому связи, которые добавляет или удаляет
+    запрос, не меняются до его завершения.
+
+    Args:
+        user (User): Пользователь, выполняющий действие.
+        recipe_ids (list): Идентификаторы рецептов.
+        model (Model): Модель "Избранное" или "Список покупок".
+        request: Запрос.
+
+    Returns:
+        Response: Результат для каждого идентификатора.
+    """
+    kind = model.__name__.lower()
+    recipe_ids = list(dict.fromkeys(recipe_ids))
+    existing = set(
+        Recipe.objects.filter(pk__in=recipe_ids).values_list('pk', flat=True)
+    )
+
+    with transaction.atomic():
+        lock_user_links(user)
+        linked = set(
+            model.objects.filter(
+                user=user, recipe_id__in=existing
+            ).values_list('recipe_id', flat=True)
+        )
+
+        if request.method == 'POST':
+            changed = existing - linked
+            model.objects.bulk_create(
+                [model(user=user, recipe_id=pk) for pk in changed]
+            )
+            if model is ShoppingCart:
+                change_shopping_list(user.pk, changed)
+            update_recipe_membership(kind, user.pk, added=changed)
+            statuses = (BULK_ADDED, BULK_ALREADY_LINKED)
+        else:
+            changed = linked
+            if model is ShoppingCart:
+                change_shopping_list(user.pk, changed, sign=-1)
+            # Изменения, которые делают обработчики сигналов, выполнены
+            # явно для всей пачки.
+            with explicit_bookkeeping(model):
+                model.objects.filter(
+                    user=user, recipe_id__in=changed
+                ).delete()
+            update_recipe_membership(kind, user.pk, removed=changed)
+            statuses = (BULK_REMOVED, BULK_NOT_LINKED)
+
+    return Response({
+        'results': [
+            {
+                'id': pk,
+                'status': (
+                    BULK_NOT_FOUND if pk not in existing
+                    else statuses[0] if pk in changed
+                    else statuses[1]
+                ),
+            }
+            for pk in recipe_ids
+        ]
+    })
+
+
 def perform_subscribe_action(author: User, context) -> Response:
     """
     Выполнить действие "Подписаться" на автора.
@@ -2,13 +2,15 @@ from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from rest_framework.permissions import DjangoModelPermissions, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Prefetch, Sum
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import Count
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 
 from api.config.config import (
@@ -19,32 +21,55 @@ from api.config.config import (
 )
 from api.filter import IngredientFilter, RecipeFilter
 from api.mixins import (
+    AnonymousResponseCacheMixin,
+    ConditionalGetMixin,
+    FastListMixin,
     MultiSerializerViewSetMixin,
     TagAndIngridientMixin,
     ViewMixin,
 )
-from api.pagination import CustomPagination
+from api.pagination import CustomPagination, EstimatedCountPagination
 from api.permissions import IsAdminOrReadOnly, IsAuthorOrAdminOrReadOnly
+from api.renderers import (
+    ShoppingListCSVRenderer,
+    ShoppingListJSONRenderer,
+    ShoppingListTextRenderer,
+)
 from api.serializers import (
     IngredientSerializer,
     MiniRecipeSerializer,
     RecipeCreateUpdateSerializer,
+    RecipeIdsSerializer,
     RecipeSerializer,
     SubscriptionSerializer,
     TagSerializer,
     UserSerializer,
 )
+from api.utils.ingredient_index import (
+    ingredient_index,
+    search_similar_ingredients,
+)
+from api.utils.serializers_utils import (
+    RECIPE_MEMBERSHIP_FLAGS,
+    RECIPE_USER_FLAGS,
+    annotate_recipe_user_flags,
+    is_field_requested,
+)
+from api.utils.units import aggregate_normalized_amounts, to_display_units
+from api.utils.uploads import RecipeImageUploadHandler
 from api.utils.utils import (
     get_author,
+    perform_bulk_favorite_or_cart_action,
     perform_favorite_or_cart_action,
     perform_subscribe_action,
 )
+from baseapp.documents import rebuild_recipe_documents
 from baseapp.models import (
     Favorite,
     Ingredient,
     Recipe,
-    RecipeIngredients,
     ShoppingCart,
+    ShoppingListItem,
     Tag,
 )
 from users.models import Subscription
@@ -61,11 +86,13 @@ class UserViewSet(DjoserUserViewSet, ViewMixin):
     add_serializer = SubscriptionSerializer
     link_model = Subscription
     pagination_class = CustomPagination
+    cursor_ordering = ('id',)
 
     def get_queryset(self):
         """Аннотация для подсчета количества рецептов."""
         queryset = super().get_queryset()
-        queryset = queryset.annotate(recipes_count=Count('recipes'))
+        if is_field_requested(self.request, 'recipes_count'):
+            queryset = queryset.annotate(recipes_count=Count('recipes'))
         return queryset
 
     @action(
@@ -127,15 +154,25 @@ class UserViewSet(DjoserUserViewSet, ViewMixin):
         return self.get_paginated_response(serializer.data)
 
 
-class TagViewSet(ModelViewSet, TagAndIngridientMixin):
+class TagViewSet(
+    ConditionalGetMixin,
+    FastListMixin,
+    ModelViewSet,
+    TagAndIngridientMixin
+):
     """Представление для операций с тегами."""
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     lookup_field = 'id'
+    cache_versions = ('tag',)
 
 
-class IngredientsViewSet(ReadOnlyModelViewSet):
+class IngredientsViewSet(
+    ConditionalGetMixin,
+    FastListMixin,
+    ReadOnlyModelViewSet
+):
     """Представление для операций с ингредиентами."""
 
     queryset = Ingredient.objects.all()
@@ -143,9 +180,39 @@ class IngredientsViewSet(ReadOnlyModelViewSet):
     permission_classes = (IsAdminOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
+    cache_versions = ('ingredient',)
+
+    def list(self, request, *args, **kwargs):
+        """
+        Поиск по началу названия обслуживается индексом в памяти
+        без запроса к базе. С параметром ?substring=1 после совпадений
+        по началу названия выводятся совпадения внутри него,
+        с ?fuzzy=1 — самые похожие названия с учетом опечаток.
+        """
+        name = request.query_params.get('name')
+        if not name:
+            return super().list(request, *args, **kwargs)
+        return self.get_conditional_response(
+            self.search_by_name, request, name, *args, **kwargs
+        )
+
+    def search_by_name(self, request, name, *args, **kwargs):
+        if request.query_params.get('fuzzy') == '1':
+            return Response(search_similar_ingredients(name))
+        return Response(
+            ingredient_index.search(
+                name, substring=request.query_params.get('substring') == '1'
+            )
+        )
 
 
-class RecipeViewSet(MultiSerializerViewSetMixin, ModelViewSet):
+class RecipeViewSet(
+    ConditionalGetMixin,
+    AnonymousResponseCacheMixin,
+    FastListMixin,
+    MultiSerializerViewSetMixin,
+    ModelViewSet
+):
     """
     Представление для операций с рецептами.
     """
@@ -153,7 +220,15 @@ class RecipeViewSet(MultiSerializerViewSetMixin, ModelViewSet):
     permission_classes = (IsAuthorOrAdminOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
-    pagination_class = CustomPagination
+    pagination_class = EstimatedCountPagination
+    cursor_ordering = ('-pub_date', '-id')
+    ranked_query_params = ('search', 'have')
+    cache_versions = (
+        'recipe', 'recipeingredients', 'tag', 'ingredient', 'user',
+    )
+    user_cache_versions = ('favorite', 'shoppingcart', 'subscription')
+    last_modified_field = 'pub_date'
+    parser_classes = (JSONParser, FormParser, MultiPartParser)
 
     serializer_classes = {
         'list': RecipeSerializer,
@@ -163,18 +238,39 @@ class RecipeViewSet(MultiSerializerViewSetMixin, ModelViewSet):
     }
 
     def get_queryset(self):
-        queryset = Recipe.objects.all()
-        queryset = queryset.select_related('author')
-        queryset = queryset.prefetch_related(
-            Prefetch('tags', queryset=Tag.objects.all()),
-            Prefetch(
-                'recipeingredients_set',
-                queryset=RecipeIngredients.objects.select_related(
-                    'ingredient'
-                ),
-            ),
+        """
+        Загружаем флаги пользователя только для полей, которые попадут
+        в ответ. Избранное и корзина проверяются по кэшу пользователя.
+        Автор, теги и ингредиенты берутся из готового документа
+        рецепта, а для рецептов без документа догружаются сериализатором.
+        """
+        request = self.request
+        queryset = Recipe.objects.defer('search_vector')
+        if not is_field_requested(request, 'text'):
+            queryset = queryset.defer('text')
+        flags = tuple(
+            flag for flag, field in RECIPE_USER_FLAGS.items()
+            if flag not in RECIPE_MEMBERSHIP_FLAGS
+            and is_field_requested(request, field)
         )
-        return queryset
+        return annotate_recipe_user_flags(queryset, request.user, flags)
+
+    def initialize_request(self, request, *args, **kwargs):
+        """Картинка из multipart/form-data пишется сразу на диск."""
+        request.upload_handlers = [RecipeImageUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        # Документ пишется в той же транзакции, что и рецепт: версии
+        # кэша обновляются только после фиксации, когда он уже готов.
+        with transaction.atomic():
+            super().perform_create(serializer)
+            rebuild_recipe_documents([serializer.instance])
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            super().perform_update(serializer)
+            rebuild_recipe_documents([serializer.instance])
 
     @action(detail=True, methods=('post', 'delete'))
     def favorite(self, request, pk=None):
@@ -206,35 +302,72 @@ class RecipeViewSet(MultiSerializerViewSetMixin, ModelViewSet):
             request,
         )
 
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='favorite',
+        permission_classes=(IsAuthenticated,),
+    )
+    def favorite_bulk(self, request):
+        """Добавить или удалить из избранного несколько рецептов."""
+        return self.perform_bulk_action(request, Favorite)
+
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='shopping_cart',
+        permission_classes=(IsAuthenticated,),
+    )
+    def shopping_cart_bulk(self, request):
+        """Добавить или удалить из списка покупок несколько рецептов."""
+        return self.perform_bulk_action(request, ShoppingCart)
+
+    def perform_bulk_action(self, request, model):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return perform_bulk_favorite_or_cart_action(
+            request.user,
+            serializer.validated_data['recipes'],
+            model,
+            request,
+        )
+
     @action(
         detail=False,
         methods=('get',),
-        permission_classes=(IsAuthenticated,)
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=(
+            ShoppingListTextRenderer,
+            ShoppingListCSVRenderer,
+            ShoppingListJSONRenderer,
+        ),
     )
     def download_shopping_cart(self, request):
-        buy_list_text = self.get_shopping_list_text(request.user)
-        response = HttpResponse(buy_list_text, content_type='text/plain')
+        """
+        Скачать список покупок в формате txt, csv или json.
+
+        Формат выбирается параметром ?format= или заголовком Accept.
+        Строки читаются из базы итератором и сразу отдаются клиенту,
+        поэтому размер корзины не влияет на потребление памяти.
+        """
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(self.get_shopping_list_rows(request.user)),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}'
+        )
         response['Content-Disposition'] = (
-            'attachment; filename=shopping-list.txt'
+            f'attachment; filename={renderer.get_filename()}'
         )
         return response
 
-    def get_shopping_list_text(self, user):
-        ingredients = RecipeIngredients.objects.filter(
-            recipe__in_shopping_list__user=user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(
-            amount=Sum('amount')
+    def get_shopping_list_rows(self, user):
+        """
+        Итератор по ингредиентам из корзины пользователя. Суммы по
+        рецептам уже посчитаны в ShoppingListItem, здесь они только
+        сводятся по единицам (см. api.utils.units) и сортируются
+        по названию.
+        """
+        rows = aggregate_normalized_amounts(
+            ShoppingListItem.objects.filter(user=user)
         )
-
-        buy_list_text = 'Список покупок:\n\n'
-
-        for ingredient in ingredients:
-            ingredient_name = ingredient['ingredient__name']
-            measurement_unit = ingredient['ingredient__measurement_unit']
-            total_amount = ingredient['amount']
-            buy_list_text += (f'{ingredient_name}, {total_amount}'
-                              f'{measurement_unit}\n')
-
-        return buy_list_text
+        return to_display_units(rows.iterator(chunk_size=500))
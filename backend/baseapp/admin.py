@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.db.models import Count
 
+from .documents import rebuild_recipe_documents
 from .models import (
     Favorite,
     Ingredient,
@@ -45,6 +46,10 @@ class RecipeAdmin(admin.ModelAdmin):
             favorited_count=Count('in_favorite')
         )
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        rebuild_recipe_documents([form.instance])
+
     def favorited_count(self, obj):
         return obj.favorited_count
 
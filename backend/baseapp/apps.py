@@ -5,3 +5,6 @@ class BaseappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'baseapp'
     verbose_name = 'Главное приложение'
+
+    def ready(self):
+        from baseapp import signals  # noqa: F401
@@ -0,0 +1,123 @@
+import json
+
+from django.db.models import Prefetch, QuerySet
+from django.dispatch import Signal
+
+from baseapp.models import Recipe, RecipeIngredients, Tag
+
+
+DOCUMENT_BATCH_SIZE = 500
+
+# Отправляется после записи пачки документов, аргумент recipe_ids.
+# Приложение api обновляет по нему версию кэша рецептов.
+recipe_documents_rebuilt = Signal()
+
+
+def get_recipe_document(recipe: Recipe) -> dict:
+    """
+    Собрать документ рецепта из модели.
+
+    Документ совпадает с ответом API о рецепте без полей, зависящих
+    от пользователя (is_favorited, is_in_shopping_cart,
+    author.is_subscribed), и без вариантов картинки: они
+    подставляются при каждом запросе. Адрес картинки хранится
+    относительным.
+
+    Args:
+        recipe (Recipe): Рецепт с загруженными автором, тегами
+            и ингредиентами.
+
+    Returns:
+        dict: Документ.
+    """
+    author = recipe.author
+    return {
+        'id': recipe.pk,
+        'name': recipe.name,
+        'author': {
+            'email': author.email,
+            'id': author.pk,
+            'username': author.username,
+            'first_name': author.first_name,
+            'last_name': author.last_name,
+        },
+        'image': recipe.image.url if recipe.image else None,
+        'text': recipe.text,
+        'ingredients': [
+            {
+                'id': row.ingredient_id,
+                'name': row.ingredient.name,
+                'measurement_unit': row.ingredient.measurement_unit,
+                'amount': row.amount,
+            }
+            for row in recipe.recipeingredients_set.all()
+        ],
+        'tags': [
+            {'id': tag.pk, 'name': tag.name, 'color': tag.color}
+            for tag in recipe.tags.all()
+        ],
+        'cooking_time': recipe.cooking_time,
+    }
+
+
+def render_recipe_document(recipe: Recipe) -> str:
+    """
+    Сериализовать документ рецепта в JSON.
+
+    Args:
+        recipe (Recipe): Рецепт.
+
+    Returns:
+        str: Документ в формате JSON.
+    """
+    return json.dumps(get_recipe_document(recipe), ensure_ascii=False)
+
+
+def rebuild_recipe_documents(recipes) -> int:
+    """
+    Пересобрать документы рецептов.
+
+    Связанные данные загружаются пачками, документы сохраняются
+    через bulk_update, поэтому сигналы моделей не отправляются.
+    Если переданы объекты рецептов, новый документ записывается
+    и в них.
+
+    После записи отправляется сигнал recipe_documents_rebuilt:
+    ответ, закэшированный со старым документом между изменением
+    данных и пересборкой, больше не должен выдаваться.
+
+    Args:
+        recipes: Queryset или список рецептов.
+
+    Returns:
+        int: Количество обновленных рецептов.
+    """
+    if isinstance(recipes, QuerySet):
+        instances = {}
+        ids = list(recipes.values_list('pk', flat=True))
+    else:
+        instances = {recipe.pk: recipe for recipe in recipes}
+        ids = list(instances)
+
+    for start in range(0, len(ids), DOCUMENT_BATCH_SIZE):
+        batch = list(
+            Recipe.objects.filter(
+                pk__in=ids[start:start + DOCUMENT_BATCH_SIZE]
+            ).select_related('author').prefetch_related(
+                Prefetch('tags', queryset=Tag.objects.all()),
+                Prefetch(
+                    'recipeingredients_set',
+                    queryset=RecipeIngredients.objects.select_related(
+                        'ingredient'
+                    ),
+                ),
+            )
+        )
+        for recipe in batch:
+            recipe.document = render_recipe_document(recipe)
+            if recipe.pk in instances:
+                instances[recipe.pk].document = recipe.document
+        Recipe.objects.bulk_update(batch, ('document',))
+    if ids:
+        recipe_documents_rebuilt.send(sender=Recipe, recipe_ids=ids)
+    return len(ids)
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.4 on 2026-10-18 02:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("baseapp", "0002_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="recipe",
+            name="pub_date",
+            field=models.DateTimeField(
+                auto_now_add=True, db_index=True, verbose_name="Дата публикации"
+            ),
+        ),
+    ]
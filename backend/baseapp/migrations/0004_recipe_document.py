@@ -0,0 +1,22 @@
+# Generated by Django 4.2.4 on 2026-10-18 02:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("baseapp", "0003_recipe_pub_date_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="document",
+            field=models.TextField(
+                blank=True,
+                editable=False,
+                help_text="Сериализованный рецепт без полей пользователя",
+                verbose_name="Готовое представление рецепта",
+            ),
+        ),
+    ]
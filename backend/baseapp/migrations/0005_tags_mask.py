@@ -0,0 +1,48 @@
+# Generated by Django 4.2.4 on 2026-10-18 03:00
+
+from django.db import migrations, models
+
+
+def fill_tags_mask(apps, schema_editor):
+    Tag = apps.get_model("baseapp", "Tag")
+    Recipe = apps.get_model("baseapp", "Recipe")
+    for bit, tag in enumerate(Tag.objects.order_by("id")):
+        tag.bit = bit
+        tag.save(update_fields=["bit"])
+    masks = {}
+    rows = Recipe.tags.through.objects.values_list("recipe_id", "tag__bit")
+    for recipe_id, bit in rows:
+        masks[recipe_id] = masks.get(recipe_id, 0) | 1 << bit
+    for recipe_id, mask in masks.items():
+        Recipe.objects.filter(pk=recipe_id).update(tags_mask=mask)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("baseapp", "0004_recipe_document"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="tags_mask",
+            field=models.BigIntegerField(
+                db_index=True,
+                default=0,
+                editable=False,
+                help_text="Битовая маска тэгов рецепта, см. Tag.bit",
+                verbose_name="Маска тэгов",
+            ),
+        ),
+        migrations.AddField(
+            model_name="tag",
+            name="bit",
+            field=models.PositiveSmallIntegerField(
+                editable=False,
+                null=True,
+                unique=True,
+                verbose_name="Бит в маске тегов рецепта",
+            ),
+        ),
+        migrations.RunPython(fill_tags_mask, migrations.RunPython.noop),
+    ]
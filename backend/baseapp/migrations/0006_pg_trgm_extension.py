@@ -0,0 +1,14 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("baseapp", "0005_tags_mask"),
+    ]
+
+    # Расширение нужно только для INGREDIENT_FUZZY_BACKEND = 'pg_trgm',
+    # на других базах операция ничего не делает.
+    operations = [
+        TrigramExtension(),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.4 on 2026-10-18 03:06
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    # tsvector и GIN есть только в PostgreSQL, на других базах поле
+    # остается пустым и поиск идет по подстроке.
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        "UPDATE baseapp_recipe SET search_vector = "
+        "setweight(to_tsvector('russian', name), 'A') || "
+        "setweight(to_tsvector('russian', text), 'B')"
+    )
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS baseapp_recipe_search_vector_gin "
+        "ON baseapp_recipe USING gin (search_vector)"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS baseapp_recipe_search_vector_gin")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("baseapp", "0006_pg_trgm_extension"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True, verbose_name="Поисковый вектор"
+            ),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 4.2.4 on 2026-10-18 03:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Sum
+
+
+def fill_shopping_list_items(apps, schema_editor):
+    RecipeIngredients = apps.get_model("baseapp", "RecipeIngredients")
+    ShoppingListItem = apps.get_model("baseapp", "ShoppingListItem")
+    rows = (
+        RecipeIngredients.objects.filter(recipe__in_shopping_list__isnull=False)
+        .values("recipe__in_shopping_list__user", "ingredient")
+        .annotate(total=Sum("amount"))
+    )
+    ShoppingListItem.objects.bulk_create(
+        (
+            ShoppingListItem(
+                user_id=row["recipe__in_shopping_list__user"],
+                ingredient_id=row["ingredient"],
+                amount=row["total"],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("baseapp", "0007_recipe_search_vector"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ShoppingListItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("amount", models.IntegerField(default=0, verbose_name="Количество")),
+                (
+                    "ingredient",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="shopping_list_items",
+                        to="baseapp.ingredient",
+                        verbose_name="Ингредиент",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="shopping_list_items",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "позиция списка покупок",
+                "verbose_name_plural": "Позиции списка покупок",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="shoppinglistitem",
+            constraint=models.UniqueConstraint(
+                fields=("user", "ingredient"), name="uq_shopping_list_item_ingredient"
+            ),
+        ),
+        migrations.RunPython(fill_shopping_list_items, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.4 on 2026-10-18 03:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("baseapp", "0008_shopping_list_item"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="image_variants",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                editable=False,
+                help_text="Пути к уменьшенным копиям картинки",
+                verbose_name="Варианты картинки",
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.4 on 2026-10-18 03:23
+
+import baseapp.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("baseapp", "0009_recipe_image_variants"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="recipe",
+            name="image",
+            field=models.ImageField(
+                blank=True,
+                help_text="Загрузите фото блюда",
+                storage=baseapp.storage.ContentAddressedStorage(),
+                upload_to="recipe/",
+                verbose_name="Картинка",
+            ),
+        ),
+    ]
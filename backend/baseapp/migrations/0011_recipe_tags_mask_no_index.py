@@ -0,0 +1,22 @@
+# Generated by Django 4.2.4 on 2026-10-18 03:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("baseapp", "0010_recipe_image_storage"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="recipe",
+            name="tags_mask",
+            field=models.BigIntegerField(
+                default=0,
+                editable=False,
+                help_text="Битовая маска тэгов рецепта, см. Tag.bit",
+                verbose_name="Маска тэгов",
+            ),
+        ),
+    ]
@@ -1,11 +1,20 @@
+import copy
+
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
 from django.forms import ValidationError
 
+from baseapp.storage import recipe_image_storage
+
 
 User = get_user_model()
 
+# Тегов немного, поэтому каждый получает свой бит в маске рецепта.
+# Старший бит BigIntegerField — знаковый, его не используем.
+MAX_TAG_BITS = 63
+
 
 class Ingredient(models.Model):
     name = models.CharField(
@@ -48,6 +57,12 @@ class Tag(models.Model):
         verbose_name='Читаемый URL для тэга',
         help_text='Введите читаемый URL для тега'
     )
+    bit = models.PositiveSmallIntegerField(
+        unique=True,
+        null=True,
+        editable=False,
+        verbose_name='Бит в маске тегов рецепта'
+    )
 
     class Meta:
         verbose_name = 'Тэг'
@@ -64,8 +79,39 @@ class Tag(models.Model):
                 'Цвет должен быть в шестнадцатеричном формате (#RRGGBB).'
             )
 
+    def save(self, *args, **kwargs):
+        if self.bit is None:
+            used = set(
+                Tag.objects.exclude(pk=self.pk).exclude(
+                    bit=None
+                ).values_list('bit', flat=True)
+            )
+            free = [bit for bit in range(MAX_TAG_BITS) if bit not in used]
+            if not free:
+                raise ValidationError(
+                    f'Нельзя создать больше {MAX_TAG_BITS} тэгов.'
+                )
+            self.bit = free[0]
+            # Рецептам уже существующего тэга бит добавит baseapp.signals.
+            self._bit_assigned = True
+        super().save(*args, **kwargs)
+
+    @property
+    def mask(self) -> int:
+        """Бит тэга в маске; 0, если тэг сохранен в обход save()."""
+        return 0 if self.bit is None else 1 << self.bit
+
 
 class Recipe(models.Model):
+    # Колонки, которые пересчитываются через queryset.update() и
+    # bulk_update (см. baseapp.signals и baseapp.documents). Полное
+    # сохранение объекта, загруженного до пересчета, не должно записать
+    # их обратно, поэтому save() пишет только те из них, которым
+    # присвоено новое значение.
+    DENORMALIZED_FIELDS = (
+        'tags_mask', 'image_variants', 'document', 'search_vector',
+    )
+
     name = models.CharField(
         max_length=200,
         blank=False,
@@ -84,10 +130,19 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         upload_to='recipe/',
+        storage=recipe_image_storage,
         blank=True,
         verbose_name='Картинка',
         help_text='Загрузите фото блюда'
     )
+    # Строятся в фоне, см. api.utils.images.
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Варианты картинки',
+        help_text='Пути к уменьшенным копиям картинки'
+    )
     text = models.TextField(
         max_length=400,
         blank=False,
@@ -109,6 +164,12 @@ class Recipe(models.Model):
         verbose_name='Тэги',
         help_text='Введите тэг/тэги'
     )
+    tags_mask = models.BigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Маска тэгов',
+        help_text='Битовая маска тэгов рецепта, см. Tag.bit'
+    )
     cooking_time = models.PositiveSmallIntegerField(
         blank=False,
         null=False,
@@ -132,8 +193,23 @@ class Recipe(models.Model):
     )
     pub_date = models.DateTimeField(
         auto_now_add=True,
+        db_index=True,
         verbose_name='Дата публикации'
     )
+    # JSON хранится текстом, а не в jsonb: jsonb меняет порядок ключей.
+    document = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name='Готовое представление рецепта',
+        help_text='Сериализованный рецепт без полей пользователя'
+    )
+    # Заполняется только на PostgreSQL (см. api.utils.search),
+    # GIN-индекс создается миграцией 0007 там же.
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор'
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
@@ -143,6 +219,58 @@ class Recipe(models.Model):
     def __str__(self) -> str:
         return f'{self.name}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_denormalized_fields()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using, fields)
+        self.remember_denormalized_fields(fields)
+
+    def remember_denormalized_fields(self, fields=None) -> None:
+        """
+        Запомнить значения DENORMALIZED_FIELDS, совпадающие с базой.
+
+        Args:
+            fields (iterable): Только эти поля; None — все загруженные.
+        """
+        stored = self.__dict__.setdefault('_stored_denormalized', {})
+        for name in self.DENORMALIZED_FIELDS:
+            if name in self.__dict__ and (fields is None or name in fields):
+                stored[name] = copy.deepcopy(self.__dict__[name])
+
+    def save(self, *args, **kwargs):
+        """
+        Сохранить рецепт.
+
+        Без update_fields записываются все загруженные поля, кроме
+        DENORMALIZED_FIELDS, значения которых не менялись после
+        загрузки: их могли пересчитать в базе после того, как объект
+        был прочитан. Присвоенное значение (recipe.document = ...)
+        сохраняется как обычно. Явный update_fields не меняется.
+        """
+        if (
+            not self._state.adding
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+        ):
+            deferred = self.get_deferred_fields()
+            stored = self.__dict__.get('_stored_denormalized', {})
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and (
+                    field.name not in self.DENORMALIZED_FIELDS
+                    or field.name in stored
+                    and self.__dict__[field.name] != stored[field.name]
+                )
+            ]
+        super().save(*args, **kwargs)
+        self.remember_denormalized_fields(kwargs.get('update_fields'))
+
     def get_ingredient_count(self):
         return self.ingredients.count()
 
@@ -205,6 +333,47 @@ class ShoppingCart(models.Model):
         return f'Рецепт {self.recipe} в списке покупок у {self.user}'
 
 
+class ShoppingListItem(models.Model):
+    """
+    Сумма ингредиента по всем рецептам в корзине пользователя.
+
+    Поддерживается при изменении корзины и ингредиентов рецептов
+    (см. api.utils.shopping_list), чтобы список покупок не пересчитывался
+    при каждом скачивании.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент'
+    )
+    amount = models.IntegerField(
+        default=0,
+        verbose_name='Количество'
+    )
+
+    class Meta:
+        verbose_name = 'позиция списка покупок'
+        verbose_name_plural = 'Позиции списка покупок'
+
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='uq_shopping_list_item_ingredient'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.ingredient} ({self.amount}) у {self.user}'
+
+
 class RecipeIngredients(models.Model):
     recipe = models.ForeignKey(
         Recipe,
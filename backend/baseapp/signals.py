@@ -0,0 +1,118 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_init,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from baseapp.models import Recipe, Tag
+
+
+def refresh_tags_mask(recipe_ids) -> None:
+    """
+    Пересчитать маску тэгов для рецептов по таблице связей.
+
+    Args:
+        recipe_ids (iterable): Идентификаторы рецептов.
+    """
+    masks = dict.fromkeys(recipe_ids, 0)
+    # Тэги без бита (созданные через bulk_create) в маску не попадают,
+    # фильтр по ним идет через таблицу связей.
+    rows = Recipe.tags.through.objects.filter(
+        recipe_id__in=masks
+    ).exclude(tag__bit=None).values_list('recipe_id', 'tag__bit')
+    for recipe_id, bit in rows:
+        masks[recipe_id] |= 1 << bit
+
+    recipes_by_mask = defaultdict(list)
+    for recipe_id, mask in masks.items():
+        recipes_by_mask[mask].append(recipe_id)
+    for mask, ids in recipes_by_mask.items():
+        Recipe.objects.filter(pk__in=ids).update(tags_mask=mask)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Поддерживает Recipe.tags_mask в актуальном состоянии."""
+    if action == 'pre_clear' and reverse:
+        instance._cleared_recipe_ids = list(
+            instance.recipes.values_list('pk', flat=True)
+        )
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        refresh_tags_mask([instance.pk])
+    elif action == 'post_clear':
+        refresh_tags_mask(getattr(instance, '_cleared_recipe_ids', []))
+    else:
+        refresh_tags_mask(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    """
+    Выдает бит тэгу, сохраненному в обход Tag.save (loaddata),
+    и добавляет новый бит в маски рецептов уже существующего тэга.
+    """
+    if instance.bit is None:
+        instance.save(update_fields=('bit',))
+        return
+    if getattr(instance, '_bit_assigned', False):
+        instance._bit_assigned = False
+        if not created:
+            Recipe.objects.filter(tags=instance).update(
+                tags_mask=F('tags_mask').bitor(instance.mask)
+            )
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    """Снимает бит удаляемого тэга со всех рецептов."""
+    if instance.bit is not None:
+        Recipe.objects.filter(tags=instance).update(
+            tags_mask=F('tags_mask').bitand(~instance.mask)
+        )
+
+
+def delete_unused_image(name: str) -> None:
+    """
+    Удалить файл картинки, если на него не ссылается ни один рецепт.
+
+    Одинаковые картинки хранятся одним файлом (см. baseapp.storage),
+    поэтому число ссылок считается по самим рецептам.
+
+    Args:
+        name (str): Имя файла в хранилище.
+    """
+    if name and not Recipe.objects.filter(image=name).exists():
+        Recipe._meta.get_field('image').storage.delete(name)
+
+
+@receiver(post_init, sender=Recipe)
+def remember_recipe_image(sender, instance, **kwargs):
+    """Запоминает картинку рецепта, загруженную из базы."""
+    name = instance.__dict__.get('image')
+    # Новый рецепт создается с файлом, а не с именем в хранилище.
+    instance._stored_image = name if isinstance(name, str) else None
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_replaced(sender, instance, **kwargs):
+    """Удаляет прежнюю картинку рецепта, если она больше не нужна."""
+    old, new = instance._stored_image, instance.image.name
+    instance._stored_image = new
+    if old and old != new:
+        transaction.on_commit(lambda: delete_unused_image(old))
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_image_deleted(sender, instance, **kwargs):
+    """Удаляет картинку удаленного рецепта, если она больше не нужна."""
+    name = instance.image.name
+    transaction.on_commit(lambda: delete_unused_image(name))
@@ -0,0 +1,72 @@
+import hashlib
+import posixpath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+# Разные написания одного расширения, чтобы одинаковые файлы,
+# загруженные под разными именами, получали одно имя.
+EXTENSION_ALIASES = {
+    '.jpeg': '.jpg',
+    '.jpe': '.jpg',
+}
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище, в котором имя файла — SHA-256 его содержимого.
+
+    Файл recipe/photo.png сохраняется как
+    recipe/ab/cd/abcd…ef.png: два уровня подкаталогов по первым
+    символам хэша, чтобы ни в одном каталоге не скапливались тысячи
+    файлов. Повторная загрузка того же содержимого не пишет ничего
+    и возвращает имя уже сохраненного файла, поэтому один файл могут
+    использовать несколько записей. Удалять его можно, только когда
+    ссылок на него не осталось, см. baseapp.signals.
+    """
+
+    def get_content_name(self, name: str, content) -> str:
+        """
+        Получить имя файла по его содержимому.
+
+        Args:
+            name (str): Имя, предложенное полем (каталог upload_to
+                и исходное имя файла).
+            content (File): Содержимое.
+
+        Returns:
+            str: Имя в хранилище.
+        """
+        digest = hashlib.sha256()
+        for chunk in content.chunks(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+
+        directory, filename = posixpath.split(name)
+        extension = posixpath.splitext(filename)[1].lower()
+        extension = EXTENSION_ALIASES.get(extension, extension)
+        return posixpath.join(
+            directory, digest[:2], digest[2:4], digest + extension
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.get_content_name(name, content)
+        if self.exists(name):
+            return name
+        # Если такой же файл параллельно сохраняет другой запрос,
+        # FileSystemStorage выберет свободное имя с суффиксом:
+        # получится копия, которая удаляется как обычный файл.
+        return super().save(name, content, max_length)
+
+
+recipe_image_storage = ContentAddressedStorage()
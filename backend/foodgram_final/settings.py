@@ -147,6 +147,83 @@ DJOSER = {
 
 PAGE_SIZE = 6
 MAX_PAGE_SIZE = 20
+PAGINATION_COUNT_CACHE_TIMEOUT = 60
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = 100_000
+RESPONSE_CACHE_TIMEOUT = 300
+MEMBERSHIP_CACHE_TIMEOUT = 60 * 60
+# Счетчики попаданий кэша избранного и корзины (manage.py
+# membership_stats). Каждое обращение пишет в кэш, поэтому по умолчанию
+# выключены.
+MEMBERSHIP_CACHE_STATS = (
+    os.getenv('MEMBERSHIP_CACHE_STATS', 'False') == 'True'
+)
+# 'trigram_index' — индекс в памяти процесса, 'pg_trgm' — расширение
+# PostgreSQL (миграция baseapp 0006 создает его на PostgreSQL).
+INGREDIENT_FUZZY_BACKEND = os.getenv(
+    'INGREDIENT_FUZZY_BACKEND', 'trigram_index'
+)
+INGREDIENT_FUZZY_LIMIT = 10
+INGREDIENT_FUZZY_THRESHOLD = 0.3
+RECIPE_INGREDIENT_INDEX_MAX_AGE = 60
+RECIPE_HAVE_MIN_COVERAGE = 0.5
+RECIPE_HAVE_CANDIDATE_LIMIT = 1000
+BULK_ACTION_MAX_SIZE = 100
+# Варианты картинок рецептов: thread — в пуле потоков процесса,
+# sync — в запросе, off — не строить.
+IMAGE_PIPELINE = os.getenv('IMAGE_PIPELINE', default='thread')
+IMAGE_PIPELINE_WORKERS = 2
+IMAGE_VARIANT_QUALITY = 80
+# Ограничения загружаемой картинки рецепта (nginx пропускает до 20 МБ).
+RECIPE_IMAGE_MAX_SIZE = 10 * 1024 * 1024
+RECIPE_IMAGE_MAX_DIMENSION = 6000
+FAST_LIST_SERIALIZATION = (
+    os.getenv('FAST_LIST_SERIALIZATION', 'False') == 'True'
+)
+
+
+# Кэш по умолчанию — в памяти процесса: для разработки и тестов.
+# Каждый воркер gunicorn держит свою копию, и сброс версий в одном
+# воркере не виден другим, поэтому на сервере оба кэша настраиваются
+# на Redis (django.core.cache.backends.redis.RedisCache) или memcached
+# (PyMemcacheCache), см. .env.example.
+DEFAULT_CACHE_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+# Параметры вытеснения понимают только кэши, которые вытесняют записи
+# сами (файловый и в памяти); Redis и memcached настраиваются на сервере.
+CULLING_CACHE_BACKENDS = (
+    'django.core.cache.backends.filebased.FileBasedCache',
+    DEFAULT_CACHE_BACKEND,
+)
+
+
+def get_cache_settings(prefix: str, location: str, max_entries: int) -> dict:
+    """Собрать настройки кэша из переменных окружения с префиксом."""
+    backend = os.getenv(f'{prefix}_BACKEND', default=DEFAULT_CACHE_BACKEND)
+    cache_settings = {
+        'BACKEND': backend,
+        'LOCATION': os.getenv(f'{prefix}_LOCATION', default=location),
+    }
+    if backend in CULLING_CACHE_BACKENDS:
+        cache_settings['OPTIONS'] = {
+            'MAX_ENTRIES': int(
+                os.getenv(f'{prefix}_MAX_ENTRIES', default=max_entries)
+            ),
+            'CULL_FREQUENCY': int(
+                os.getenv(f'{prefix}_CULL_FREQUENCY', default=3)
+            ),
+        }
+    return cache_settings
+
+
+CACHES = {
+    # Ответы, счетчики страниц, множества избранного и корзины.
+    'default': get_cache_settings('CACHE', 'foodgram', 10_000),
+    # Версии таблиц: по ним инвалидируется все остальное, поэтому
+    # они хранятся отдельно и не вытесняются вместе с ответами.
+    # Для Redis — отдельная база без политики вытеснения.
+    'versions': get_cache_settings(
+        'VERSIONS_CACHE', 'foodgram-versions', 10_000
+    ),
+}
 
 
 LOGGING = {